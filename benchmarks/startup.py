@@ -0,0 +1,82 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""CLI startup import-time benchmark.
+
+Runs `python -X importtime nise ocp --help` several times and fails when the
+median total import time exceeds a budget.
+
+Usage:
+
+    python benchmarks/startup.py [--budget MS] [--runs N] [ARGS ...]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def import_times(cli_args):
+    """Run the CLI once and return {top-level module: cumulative import time in ms}."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "nise", *cli_args],
+        cwd=ROOT_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # nested imports are indented beneath the module that imported them
+        if name.startswith("  "):
+            continue
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def main():
+    """Run the startup benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=100.0, help="Import time budget in ms. Default is 100.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs. Default is 5.")
+    parser.add_argument(
+        "cli_args", nargs="*", default=["ocp", "--help"], help="nise arguments. Default is 'ocp --help'."
+    )
+    args = parser.parse_args()
+
+    runs = [import_times(args.cli_args) for _ in range(args.runs)]
+    totals = [sum(run.values()) for run in runs]
+    median = statistics.median(totals)
+
+    slowest = sorted(runs[-1].items(), key=lambda item: item[1], reverse=True)[:10]
+    for name, elapsed in slowest:
+        print(f"{elapsed:10.1f} ms  {name}")
+    print(f"median import time: {median:.1f} ms (budget {args.budget:.1f} ms, {args.runs} runs)")
+
+    if median > args.budget:
+        print("FAIL: import time is over budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Generator, column type, template and end-to-end CLI benchmarks.
+
+`run` measures the benchmarks and saves the results as JSON. `compare` checks
+a result file against a baseline and fails when any benchmark regressed by
+more than a threshold.
+
+Benchmarks:
+    lines:base:TEMPLATE    rows/sec of BaseGenerator.lines() on an OCP template
+    lines:ocp:TEMPLATE     rows/sec of OCPGenerator.lines() on an OCP template
+    column:TYPE            ns per value of the compiled columns of each type
+    template:TEMPLATE      ms to load and render an OCP template
+    rss:RANGE              peak RSS in MiB of the CLI generating a month or a year of data
+
+Usage:
+
+    python benchmarks/suite.py run [--output FILE] [--hours N] [--repeat N] [--only PREFIX ...]
+    python benchmarks/suite.py compare BASELINE CURRENT [--threshold PERCENT]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# first day of the benchmarked report period
+START = datetime(2020, 1, 1)
+
+# renders timed together in each template benchmark, to smooth out timer noise
+RENDERS = 100
+
+# date ranges of the peak RSS benchmarks
+RSS_RANGES = {"month": ("2020-01-01", "2020-02-01"), "year": ("2020-01-01", "2021-01-01")}
+
+# child process generating report files and printing its peak RSS in KiB
+RSS_SCRIPT = """
+import resource, runpy, sys
+sys.argv = ["nise"] + sys.argv[1:]
+sys.path.insert(0, {root_dir!r})
+runpy.run_module("nise", run_name="__main__", alter_sys=True)
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def result(value, unit, higher_is_better):
+    """Return one benchmark result."""
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+
+
+def best_of(repeat, func):
+    """Return the shortest wall-clock time of several calls of func, in seconds."""
+    elapsed = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed.append(time.perf_counter() - started)
+    return min(elapsed)
+
+
+def ocp_templates():
+    """Return the names of the OCP templates."""
+    from nise.config import TEMPLATE_DIR
+
+    return sorted(fname for fname in os.listdir(os.path.join(TEMPLATE_DIR, "ocp")) if fname.endswith(".yaml"))
+
+
+def ocp_configs(hours):
+    """Return {template name: parsed config} with a report period of `hours` hours."""
+    from nise.config import load_config
+    from nise.generators import get_generator
+
+    generator_class = get_generator("ocp")
+    configs = {}
+    for fname in ocp_templates():
+        config = load_config(f"ocp/{fname}", seed=0, report_month=START.month, report_year=START.year, clusterid="c")
+        for column in config["columns"]:
+            if column["name"] == generator_class._period_start:
+                column["default"] = START
+            elif column["name"] == generator_class._period_end:
+                column["default"] = START + timedelta(hours=hours)
+        configs[fname] = config
+    return configs
+
+
+def bench_lines(args, results):
+    """Measure rows/sec of BaseGenerator.lines() and OCPGenerator.lines() for each template."""
+    from nise.generators import get_generator
+    from nise.generators.base import BaseGenerator
+    from nise.util.fake import seed_all
+
+    generator_class = get_generator("ocp")
+    for fname, config in ocp_configs(args.hours).items():
+        name = os.path.splitext(fname)[0]
+        seed_all(0)
+        ocp_generator = generator_class(config)
+        base_generator = BaseGenerator(config)
+        rows = ocp_generator.row_count
+
+        def ocp_lines():
+            for _ in ocp_generator.lines():
+                pass
+
+        def base_lines():
+            for _ in islice(base_generator.lines(), rows):
+                pass
+
+        results[f"lines:ocp:{name}"] = result(rows / best_of(args.repeat, ocp_lines), "rows/sec", True)
+        results[f"lines:base:{name}"] = result(rows / best_of(args.repeat, base_lines), "rows/sec", True)
+
+
+def bench_columns(args, results):
+    """Measure the cost of one value of the compiled OCP columns of each type.
+
+    Columns are called once per generated row, with the generator's row state
+    advancing as it does in lines(). The cost of iterating the rows alone is
+    subtracted.
+    """
+    from nise.generators import get_generator
+    from nise.util.fake import seed_all
+
+    generator_class = get_generator("ocp")
+    by_type = {}
+    for config in ocp_configs(args.hours).values():
+        seed_all(0)
+        generator = generator_class(config)
+        for column in config["columns"]:
+            by_type.setdefault(column["type"], []).append((generator, generator.compile_column(column)))
+
+    for coltype, columns in sorted(by_type.items()):
+        values = 0
+        elapsed = 0.0
+        for generator, func in columns:
+
+            def call():
+                for _ in generator._rows():
+                    func()
+
+            def iterate():
+                for _ in generator._rows():
+                    pass
+
+            values += generator.row_count
+            elapsed += max(0.0, best_of(args.repeat, call) - best_of(args.repeat, iterate))
+        results[f"column:{coltype}"] = result(elapsed / values * 1e9, "ns/value", False)
+
+
+def bench_templates(args, results):
+    """Measure load and render time of each OCP template."""
+    from nise.config import get_environment, load_template
+
+    get_environment()
+    for fname in ocp_templates():
+        name = os.path.splitext(fname)[0]
+
+        def render():
+            for _ in range(RENDERS):
+                load_template(f"ocp/{fname}", report_month=START.month, report_year=START.year, clusterid="c")
+
+        results[f"template:{name}"] = result(best_of(args.repeat, render) / RENDERS * 1000, "ms", False)
+
+
+def bench_rss(args, results):
+    """Measure peak RSS of the CLI generating a month and a year of OCP data."""
+    script = RSS_SCRIPT.format(root_dir=ROOT_DIR)
+    for name, (start, end) in RSS_RANGES.items():
+        with tempfile.TemporaryDirectory() as output_dir:
+            proc = subprocess.run(
+                [sys.executable, "-c", script, "--seed", "0", "--start", start, "--end", end]
+                + ["--output-dir", output_dir, "ocp", "--clusterid", "c"],
+                stdout=subprocess.PIPE,
+                check=True,
+                universal_newlines=True,
+            )
+        results[f"rss:{name}"] = result(int(proc.stdout.split()[-1]) / 1024, "MiB", False)
+
+
+BENCHMARKS = {"lines": bench_lines, "column": bench_columns, "template": bench_templates, "rss": bench_rss}
+
+
+def run(args):
+    """Run the benchmarks and save their results."""
+    results = {}
+    for prefix, bench in BENCHMARKS.items():
+        if args.only and prefix not in args.only:
+            continue
+        bench(args, results)
+
+    for name, res in results.items():
+        print(f"{name:40s} {res['value']:14.2f} {res['unit']}")
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "hours": args.hours,
+        "results": results,
+    }
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+    print(f"Saved results to {args.output}")
+    return 0
+
+
+def compare(args):
+    """Compare benchmark results against a baseline, failing on regressions."""
+    with open(args.baseline) as baseline_file, open(args.current) as current_file:
+        baseline = json.load(baseline_file)["results"]
+        current = json.load(current_file)["results"]
+
+    regressions = []
+    for name in sorted(baseline.keys() & current.keys()):
+        before, after = baseline[name]["value"], current[name]["value"]
+        if not before:
+            continue
+        change = (after - before) / before * 100
+        worse = -change if baseline[name]["higher_is_better"] else change
+        status = "REGRESSED" if worse > args.threshold else "ok"
+        if worse > args.threshold:
+            regressions.append(name)
+        print(f"{name:40s} {before:14.2f} -> {after:14.2f} {baseline[name]['unit']:10s} {change:+7.1f}%  {status}")
+
+    for name in sorted(baseline.keys() ^ current.keys()):
+        print(f"{name:40s} only in {'baseline' if name in baseline else 'current'} results")
+
+    if regressions:
+        print(f"FAIL: {len(regressions)} benchmarks regressed by more than {args.threshold:.1f}%")
+        return 1
+    return 0
+
+
+def main():
+    """Run the benchmark suite."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parser_run = subparsers.add_parser("run", help="run the benchmarks")
+    parser_run.set_defaults(func=run)
+    parser_run.add_argument("--output", default="benchmark.json", help="Result file. Default is benchmark.json.")
+    parser_run.add_argument(
+        "--hours", type=int, default=168, help="Report period of the generator benchmarks, in hours. Default is 168."
+    )
+    parser_run.add_argument("--repeat", type=int, default=3, help="Runs of each timing; the best is kept. Default is 3.")
+    parser_run.add_argument(
+        "--only", nargs="+", choices=sorted(BENCHMARKS), help="Benchmark groups to run. Default is all of them."
+    )
+
+    parser_compare = subparsers.add_parser("compare", help="compare results against a baseline")
+    parser_compare.set_defaults(func=compare)
+    parser_compare.add_argument("baseline", help="Baseline result file.")
+    parser_compare.add_argument("current", help="Result file to check.")
+    parser_compare.add_argument(
+        "--threshold", type=float, default=10.0, help="Allowed regression, in percent. Default is 10."
+    )
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Cost and usage data generator.
+
+The library API is agenerate(), which asynchronously generates batches of
+report rows. See aio.py.
+"""
+
+
+def agenerate(*args, **kwargs):
+    """Asynchronously generate batches of report rows, as documented in nise.aio."""
+    from nise.aio import agenerate as _agenerate
+
+    return _agenerate(*args, **kwargs)
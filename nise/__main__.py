@@ -16,18 +16,22 @@
 #
 """Cost and Usage Generator CLI."""
 import argparse
+import hashlib
 import os
+import random
 import sys
-import yaml
-from datetime import datetime
+import time
+from contextlib import ExitStack
+from copy import copy
+from datetime import datetime, timedelta
+from operator import itemgetter
 
-from faker import Faker
-from util.date import DateHelper
+from nise.util.date import DateHelper
+from nise.util.log import LOG, LOG_VERBOSITY, log_to_stderr
 
-from config import load_template, TEMPLATE_DIR
-from util.log import LOG, LOG_VERBOSITY
-
-FAKE = Faker()
+# NOTE: Faker, Jinja, YAML, NumPy and the generator and writer modules are
+# imported inside main(), after argument parsing, so that `--help` and argument
+# errors do not pay for them. Generators are loaded by sub-command name.
 
 
 def parse_args():
@@ -53,18 +57,103 @@ def parse_args():
         type=valid_date,
         help="Date to end generating data. Default is today.",
     )
+    parser.add_argument(
+        '--monthly',
+        action='store_true',
+        help='Generate one set of report files per calendar month of the --start to --end range, '
+        'using --workers processes.',
+    )
     parser.add_argument(
         "--static-report-file", metavar="FILE", required=False, help="Generate static data based on yaml."
     )
+    parser.add_argument(
+        '--output-dir',
+        metavar='DIR',
+        default='.',
+        help='Directory to write report files, created if it does not exist. Default is the current directory.',
+    )
+    parser.add_argument(
+        '--format',
+        dest='output_format',
+        choices=['csv', 'parquet', 'arrow'],
+        default='csv',
+        help='Format of report files. Parquet and Arrow IPC output require pyarrow. Default is csv.',
+    )
+    parser.add_argument(
+        '--append',
+        action='store_true',
+        help='Append to existing CSV report files, starting after their last generated interval. '
+        'Rows already in the files keep the report period end they were written with.',
+    )
+    parser.add_argument(
+        '--compress',
+        choices=['gzip', 'zstd'],
+        help='Compress CSV report files on all cores while they are written. zstd requires zstandard.',
+    )
+    parser.add_argument(
+        '--max-rows',
+        metavar='N',
+        type=int,
+        help='Split CSV report files into numbered chunks of at most N rows, described by a manifest.',
+    )
+    parser.add_argument(
+        '--max-size',
+        metavar='SIZE',
+        type=valid_size,
+        help='Split CSV report files into numbered chunks of at most SIZE bytes (K, M and G suffixes are allowed).',
+    )
+    parser.add_argument(
+        '--chunk-writers',
+        metavar='N',
+        type=int,
+        default=2,
+        help='Number of threads writing chunk files of split reports. Default is 2.',
+    )
+    parser.add_argument(
+        '--workers', metavar='N', type=int, default=1, help='Number of worker processes per report file. Default is 1.'
+    )
+    parser.add_argument(
+        '--seed', type=int, required=False, help='Seed for random values, to make generated data reproducible.'
+    )
+    parser.add_argument(
+        '--profile', action='store_true', help='Time every generated column, and print a report of the slowest.'
+    )
+    parser.add_argument('--profile-output', metavar='FILE', help='Save the --profile report as JSON to FILE.')
     parser.add_argument(
         "--upload", metavar="ENDPOINT", required=False, help="URL for Red Hat Insights upload service."
     )
+    parser.add_argument(
+        '--upload-concurrency',
+        metavar='N',
+        type=int,
+        default=4,
+        help='Number of concurrent chunk uploads to the upload service. Default is 4.',
+    )
+    parser.add_argument(
+        '--stream',
+        metavar='TARGET',
+        help='Stream the rows of one report, instead of writing report files, to TARGET: '
+        "'-' for stdout, a Unix domain socket, or a FIFO.",
+    )
+    parser.add_argument(
+        '--stream-report',
+        metavar='NAME',
+        help='Stream the report whose file name contains NAME, such as pod_usage. Default is the first report.',
+    )
+    parser.add_argument(
+        '--rate',
+        metavar='ROWS',
+        type=valid_rate,
+        help='Target rate of --stream, in rows per second. Default is as fast as the consumer reads.',
+    )
 
     # sub-commands
     subparsers = parser.add_subparsers(
         title="sub-commands", description="Supported sub-commands", help="data generator (required)", required=True
     )
 
+    parser.set_defaults(interval_start=None, interval_end=None)
+
     parser_aws = subparsers.add_parser("aws", help="generate aws data")
     aws_args(parser_aws)
 
@@ -118,7 +207,20 @@ def gcp_args(parser):
 def ocp_args(parser):
     """OCP-specific CLI args"""
     parser.set_defaults(cmd="ocp")
-    parser.add_argument("--clusterid", default=FAKE.word(), help="Cluster identifier for usage data.")
+    parser.add_argument('--clusterid', help='Cluster identifier for usage data. Default is a random word.')
+    clusters = parser.add_mutually_exclusive_group()
+    clusters.add_argument(
+        '--clusters',
+        metavar='N',
+        type=int,
+        help='Generate N clusters, named CLUSTERID-001 to CLUSTERID-N.',
+    )
+    clusters.add_argument(
+        '--cluster-file',
+        metavar='FILE',
+        help="Generate the clusters listed in FILE, one 'CLUSTERID [SCALE]' line each. "
+        'SCALE multiplies the cluster size and defaults to 1.',
+    )
 
 
 def valid_date(date_string):
@@ -131,6 +233,33 @@ def valid_date(date_string):
     return valid
 
 
+def valid_rate(rate_string):
+    """Create a positive rate from a rate string."""
+    try:
+        rate = float(rate_string)
+    except ValueError:
+        rate = 0
+    if rate <= 0:
+        msg = '{} is an unsupported rate.'.format(rate_string)
+        raise argparse.ArgumentTypeError(msg)
+    return rate
+
+
+def valid_size(size_string):
+    """Create a size in bytes from a size string, such as 512, 64K, 100M or 1G."""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    multiplier = units.get(size_string[-1:].upper(), 1)
+    number = size_string[:-1] if multiplier > 1 else size_string
+    try:
+        size = int(number) * multiplier
+    except ValueError:
+        size = 0
+    if size <= 0:
+        msg = '{} is an unsupported size.'.format(size_string)
+        raise argparse.ArgumentTypeError(msg)
+    return size
+
+
 # XXX: This interface is a bit clumsy.
 def update_config(config, key, value, update):
     """Update the default of a parsed template dict, matching search criteria.
@@ -150,46 +279,423 @@ def update_config(config, key, value, update):
     return updated
 
 
-def main():
-    """Run data generation program."""
-    args = parse_args()
-    if args.verbosity:
-        LOG.setLevel(LOG_VERBOSITY[args.verbosity])
-    LOG.debug("CLI Args: %s", args)
+def resume_kwargs(generator_class, configs, paths, seed, clusterid):
+    """Return generator keyword args continuing existing report files.
+
+    Args:
+        generator_class (class) ChronoGenerator sub-class
+        configs (list) compiled configurations of the reports
+        paths (list) paths of the report files
+        seed (int) seed for random values, or None
+        clusterid (str) cluster id of the reports
+
+    Returns:
+        (dict) keyword args for generator_class.report_set(), or None if the reports are complete
+    """
+    from nise.checkpoint import resume
+    from nise.exceptions import NiseError
+    from nise.util import get_from_config
+
+    colformat = get_from_config('name', generator_class._usage_end, configs[0]).get('format')
+    try:
+        checkpoint = resume(paths, generator_class._usage_end, colformat)
+    except NiseError as exc:
+        LOG.error(str(exc))
+        sys.exit(1)
+    if checkpoint is None:
+        LOG.info('No report files to append to: generating the whole report period.')
+        return {}
+
+    interval_start = checkpoint.interval_end
+    end_date = get_from_config('name', generator_class._period_end, configs[0]).get('default')
+    if interval_start >= end_date:
+        LOG.info(f'Report files are complete up to {interval_start}: nothing to append.')
+        return None
+
+    kwargs = {'interval_start': interval_start}
+    if checkpoint.sizes:
+        if checkpoint.clusterid != clusterid:
+            LOG.error(f'Unable to append: report files describe cluster {checkpoint.clusterid}, not {clusterid}.')
+            sys.exit(1)
+        if checkpoint.seed is None:
+            LOG.warning('Report files were generated without --seed: new rows will describe different entities.')
+        elif checkpoint.seed != seed:
+            LOG.error(f'Unable to append: report files were generated with --seed {checkpoint.seed}.')
+            sys.exit(1)
+        # the topology is rebuilt from the seed and its sizes
+        kwargs['sizes'] = checkpoint.sizes
+    elif seed is None:
+        LOG.warning('Appending without a checkpoint or --seed: new rows will describe different entities.')
+    LOG.info(f'Appending rows from {interval_start}.')
+    return kwargs
+
+
+def render_configs(args):
+    """Render and parse the templates of the sub-command.
+
+    Args:
+        args (Namespace) parsed CLI args
 
-    tmpl_path = f"{TEMPLATE_DIR}/{args.cmd}"
-    for fname in os.listdir(tmpl_path):
-        if os.path.splitext(fname)[1] != ".yaml":
-            continue
+    Returns:
+        (list) parsed configurations
+    """
+    from nise.config import load_configs
+
+    return load_configs(
+        args.cmd,
+        seed=args.seed,
+        report_month=args.start_date.month,
+        report_year=args.start_date.year,
+        clusterid=args.clusterid,
+    )
 
-        tmpl_args = {
-            "report_month": args.start_date.month,
-            "report_year": args.start_date.year,
-            "clusterid": args.clusterid,
-        }
 
-        LOG.debug(f"Loading: {tmpl_path}/{fname}")
-        template = load_template(f"{args.cmd}/{fname}", **tmpl_args)
-        ymldict = yaml.safe_load(template)
-        LOG.debug(f"Rendered YAML: {ymldict}")
+def generate_reports(args, configs, scale=1.0):
+    """Generate and write the report files of parsed configurations.
 
-        generator = None
-        header = None
+    Args:
+        args (Namespace) parsed CLI args
+        configs (list) parsed configurations, from render_configs()
+        scale (float) multiplier of the cluster topology sizes
+    """
+    from nise.generators import get_generator
+    from nise.writers import CODECS, CSVWriter, RolloverWriter, WRITERS
 
-        if args.cmd == "ocp":
-            from generators import OCPGenerator
+    generators = []
 
+    if args.cmd == 'ocp':
+        generator_class = get_generator(args.cmd)
+        for ymldict in configs:
+            ymldict['columns'] = update_config(
+                ymldict.get('columns'), 'name', generator_class._period_start, args.start_date
+            )
             ymldict["columns"] = update_config(
-                ymldict.get("columns"), "name", OCPGenerator._period_start, args.start_date
+                ymldict.get('columns'), 'name', generator_class._period_end, args.end_date
             )
-            ymldict["columns"] = update_config(ymldict.get("columns"), "name", OCPGenerator._period_end, args.end_date)
-            generator = OCPGenerator(ymldict)
-            header = generator.header
-        count = 0
-        for line in generator.lines():
-            if count >= 5000:
-                break
-            count += 1
+
+    if args.stream and args.cmd == 'ocp':
+        generators = generator_class.report_set(
+            configs, scale=scale, interval_start=args.interval_start, interval_end=args.interval_end
+        )
+        stream_report(args, configs, generators)
+        return
+
+    writer_class = WRITERS[args.output_format]
+    writer_kwargs = {}
+    extension = writer_class.extension
+    if writer_class is CSVWriter:
+        if args.compress:
+            writer_kwargs['compression'] = CODECS[args.compress]()
+        if args.max_rows or args.max_size:
+            # chunk files are named and compressed by the writer
+            writer_class = RolloverWriter
+            writer_kwargs.update(max_rows=args.max_rows, max_bytes=args.max_size, threads=args.chunk_writers)
+        elif args.compress:
+            extension += writer_kwargs['compression'].suffix
+    elif args.max_rows or args.max_size or args.compress:
+        LOG.warning(f'Ignoring --max-rows, --max-size and --compress: {args.output_format} files are not split.')
+    paths = [
+        os.path.join(args.output_dir, os.path.splitext(ymldict.get('filename'))[0] + extension)
+        for ymldict in configs
+    ]
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    if args.cmd == 'ocp':
+        generator_kwargs = {'interval_start': args.interval_start, 'interval_end': args.interval_end}
+        if args.append:
+            if writer_class is not CSVWriter:
+                LOG.error('--append only supports single CSV report files.')
+                sys.exit(1)
+            resumed = resume_kwargs(generator_class, configs, paths, args.seed, args.clusterid)
+            if resumed is None:
+                return
+            generator_kwargs.update(resumed)
+        generators = generator_class.report_set(configs, scale=scale, **generator_kwargs)
+    written = []
+    with ExitStack() as stack:
+        upload = None
+        if args.upload:
+            from nise.upload import UploadPipeline
+
+            # report files are uploaded in chunks while they are generated
+            upload = stack.enter_context(UploadPipeline(args.upload, concurrency=args.upload_concurrency))
+
+        writer_kwargs['upload'] = upload
+        if args.append:
+            writer_kwargs['append'] = True
+
+        if writer_class not in (CSVWriter, RolloverWriter):
+            if args.workers > 1:
+                LOG.warning(f'Ignoring --workers: {args.output_format} files are written by a single process.')
+            # columnar files are written straight from column-oriented batches
+            for generator, path in zip(generators, paths):
+                with writer_class(path, generator.header, generator.column_types, upload=upload) as writer:
+                    writer.write_batches(generator.batches())
+                LOG.info(writer.summary())
+        elif args.workers > 1:
+            from nise.parallel import generate_sharded
+
+            for generator, path in zip(generators, paths):
+                writer = generate_sharded(
+                    generator, path, args.workers, seed=args.seed, writer_class=writer_class, **writer_kwargs
+                )
+                LOG.info(writer.summary())
+                written.append(generator)
+        else:
+            from nise.generators.date import interleave
+
+            # walk the timeline once, fanning each interval out to every report
+            writers = [
+                writer_class(path, generator.header, **writer_kwargs) for generator, path in zip(generators, paths)
+            ]
+            with ExitStack() as files:
+                for writer in writers:
+                    files.enter_context(writer)
+                for index, lines in interleave(generators, 'text_lines'):
+                    writers[index].write_lines(lines)
+            for writer in writers:
+                LOG.info(writer.summary())
+            written.extend(generators)
+
+    if writer_class is CSVWriter and written:
+        from nise.checkpoint import Checkpoint, save_checkpoint
+
+        generator = written[0]
+        checkpoint = Checkpoint(
+            generator.interval_end, seed=args.seed, clusterid=args.clusterid, sizes=generator.topology.sizes
+        )
+        save_checkpoint(paths, checkpoint)
+
+    if upload is not None:
+        LOG.info(upload.summary())
+
+
+def stream_report(args, configs, generators):
+    """Stream the rows of one report to the --stream target.
+
+    Args:
+        args (Namespace) parsed CLI args
+        configs (list) parsed configurations
+        generators (list) one generator per configuration
+    """
+    from nise.writers import StreamWriter
+
+    names = [ymldict.get('filename') for ymldict in configs]
+    matches = [idx for idx, name in enumerate(names) if args.stream_report is None or args.stream_report in name]
+    if not matches:
+        LOG.error(f"No report matches --stream-report {args.stream_report}: reports are {', '.join(names)}")
+        sys.exit(1)
+    ignored = [
+        option
+        for option, value in (
+            ('--append', args.append),
+            ('--compress', args.compress),
+            ('--format', args.output_format != 'csv'),
+            ('--max-rows', args.max_rows),
+            ('--max-size', args.max_size),
+            ('--upload', args.upload),
+            ('--workers', args.workers > 1),
+        )
+        if value
+    ]
+    if ignored:
+        LOG.warning(f"Ignoring {', '.join(ignored)}: --stream writes CSV rows from a single process.")
+
+    generator = generators[matches[0]]
+    LOG.info(f'Streaming {names[matches[0]]} to {args.stream}.')
+    writer = StreamWriter(args.stream, generator.header, rate=args.rate)
+    try:
+        with writer:
+            writer.write_lines(generator.text_lines())
+    except BrokenPipeError:
+        LOG.warning('The stream consumer disconnected before the end of the report.')
+    LOG.info(writer.summary())
+
+
+def cluster_seed(seed, clusterid):
+    """Derive the seed of one cluster of a fan-out from the --seed value."""
+    digest = hashlib.sha256(f'{seed}:{clusterid}'.encode()).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def cluster_list(args):
+    """Return the (cluster id, scale) pairs of a fan-out, or None for a single cluster.
+
+    Clusters come from --cluster-file, with one "CLUSTERID [SCALE]" line per
+    cluster, or are named CLUSTERID-001 to CLUSTERID-N for --clusters N.
+    """
+    if args.cluster_file:
+        clusters = []
+        with open(args.cluster_file) as cluster_file:
+            for line in cluster_file:
+                fields = line.split('#')[0].split()
+                if fields:
+                    clusters.append((fields[0], float(fields[1]) if len(fields) > 1 else 1.0))
+        return clusters
+    if args.clusters:
+        return [(f'{args.clusterid}-{idx:03d}', 1.0) for idx in range(1, args.clusters + 1)]
+    return None
+
+
+def report_periods(start_date, end_date):
+    """Split a date range into calendar month report periods.
+
+    Args:
+        start_date (datetime) start of the first usage interval
+        end_date (datetime) end of the last usage interval
+
+    Returns:
+        (list) (period start, period end, interval start, interval end) tuples, one per month.
+            Periods run from the 1st of a month to the 1st of the next month. Intervals
+            are the part of the period within the date range.
+    """
+    dh = DateHelper()
+    periods = []
+    for month_start in dh.list_months(start_date, end_date):
+        month_end = dh.next_month(month_start)
+        interval_start, interval_end = max(start_date, month_start), min(end_date, month_end)
+        if interval_start < interval_end:
+            periods.append((month_start, month_end, interval_start, interval_end))
+    return periods
+
+
+def plan_jobs(args):
+    """Split the generation into jobs of one cluster and one report period each.
+
+    Jobs are ordered largest first, by the number of hourly intervals times
+    the cluster scale, so that a pool of workers stays busy until the end.
+
+    Args:
+        args (Namespace) parsed CLI args
+
+    Returns:
+        (list) (args of the job, cluster scale) pairs
+    """
+    clusters = cluster_list(args) if args.cmd == 'ocp' else None
+    if args.monthly:
+        periods = report_periods(args.start_date, args.end_date)
+        if args.seed is None and len(periods) > 1:
+            # every month of a cluster must describe the same entities
+            args.seed = random.getrandbits(64)
+            LOG.info(f'Generating the report months with seed {args.seed}.')
+    else:
+        periods = [(args.start_date, args.end_date, None, None)]
+
+    jobs = []
+    for clusterid, scale in clusters or [(args.clusterid, 1.0)]:
+        seed = args.seed
+        if clusters and seed is not None:
+            seed = cluster_seed(seed, clusterid)
+        for period_start, period_end, interval_start, interval_end in periods:
+            job = copy(args)
+            job.clusterid, job.seed = clusterid, seed
+            job.start_date, job.end_date = period_start, period_end
+            job.interval_start, job.interval_end = interval_start, interval_end
+            hours = ((interval_end or period_end) - (interval_start or period_start)) / timedelta(hours=1)
+            jobs.append((scale * hours, job, scale))
+    jobs.sort(key=itemgetter(0), reverse=True)
+    return [(job, scale) for _, job, scale in jobs]
+
+
+def _generate_job(task):
+    """Generate the report files of one job, in a worker process or in this one."""
+    from nise.util.fake import seed_all
+
+    args, scale = task
+    started = time.perf_counter()
+    # forked workers inherit the parent's random state: restart it for each job
+    seed_all(args.seed)
+    generate_reports(args, render_configs(args), scale=scale)
+    return f'{args.clusterid} {args.start_date:%Y-%m}', time.perf_counter() - started
+
+
+def run_jobs(args, jobs):
+    """Generate the report files of several jobs on a pool of forked worker processes.
+
+    Templates are compiled, and Faker and the generator and writer modules
+    are loaded, once in this process before the workers are forked. Each
+    worker renders the templates for its job and writes its own report
+    files. Jobs are generated one at a time in this process when there is
+    a single worker.
+
+    Args:
+        args (Namespace) parsed CLI args. --workers is the number of jobs generated at once.
+        jobs (list) (args of the job, cluster scale) pairs, largest first
+    """
+    import multiprocessing
+
+    import nise.writers  # noqa: F401
+    from nise.config import get_environment, TEMPLATE_DIR
+    from nise.generators import get_generator
+    from nise.util.fake import FAKE
+
+    processes = min(args.workers, len(jobs))
+    for job, _ in jobs:
+        job.workers = 1
+    LOG.info(f'Generating {len(jobs)} jobs in {processes} processes.')
+
+    context = None
+    if processes > 1:
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            LOG.warning('Generating jobs one at a time: process forking is not supported on this platform.')
+    if context is None:
+        for name, elapsed in map(_generate_job, jobs):
+            LOG.info(f'Generated {name} in {elapsed:.2f}s')
+        return
+
+    environment = get_environment()
+    for fname in sorted(os.listdir(f'{TEMPLATE_DIR}/{args.cmd}')):
+        if fname.endswith('.yaml'):
+            environment.get_template(f'{args.cmd}/{fname}')
+    get_generator(args.cmd)
+    faker = FAKE.faker  # noqa: F841 Faker loads its providers on first use
+    with context.Pool(processes) as pool:
+        # one job per task, so that the largest jobs are started first
+        for name, elapsed in pool.imap_unordered(_generate_job, jobs, chunksize=1):
+            LOG.info(f'Generated {name} in {elapsed:.2f}s')
+
+
+def main():
+    """Run data generation program."""
+    args = parse_args()
+    from nise.generators.base import BaseGenerator
+    from nise.util.fake import FAKE, seed_all
+
+    if args.stream == '-':
+        # keep the stream of rows on stdout free of log records
+        log_to_stderr()
+    if args.verbosity:
+        LOG.setLevel(LOG_VERBOSITY[args.verbosity])
+    LOG.debug('CLI Args: %s', args)
+    if args.seed is not None:
+        seed_all(args.seed)
+    if args.profile or args.profile_output:
+        from nise.generators.profile import ColumnProfiler
+
+        BaseGenerator.profiler = ColumnProfiler()
+        if args.workers > 1:
+            LOG.warning('Ignoring --workers: profiled reports are generated by a single process.')
+            args.workers = 1
+    if args.cmd == 'ocp' and not args.clusterid:
+        args.clusterid = FAKE.draw('word')
+
+    jobs = plan_jobs(args)
+    if args.stream and len(jobs) > 1:
+        LOG.error('--stream supports a single cluster and report period.')
+        sys.exit(1)
+    if len(jobs) > 1:
+        run_jobs(args, jobs)
+    else:
+        job, scale = jobs[0]
+        generate_reports(job, render_configs(job), scale=scale)
+
+    if args.profile:
+        print(BaseGenerator.profiler.report(), file=sys.stderr if args.stream == '-' else sys.stdout)
+    if args.profile_output:
+        BaseGenerator.profiler.dump(args.profile_output)
+        LOG.info(f'Saved column profile to {args.profile_output}')
 
 
 if __name__ == "__main__":
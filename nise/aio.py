@@ -0,0 +1,137 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Asynchronous API to generate batches of report rows inside asyncio applications.
+
+Example:
+    import nise
+
+    async for report, batch in nise.agenerate("ocp", start, end, clusterid="my-cluster", seed=42):
+        for row in batch.rows():
+            ...
+"""
+
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from nise.config import load_configs
+from nise.exceptions import NiseError
+from nise.generators import GENERATORS, get_generator
+from nise.util import get_from_config
+from nise.util.fake import FAKE, seed_all
+
+# number of batches generated ahead of the consumer
+LOOKAHEAD = 2
+
+# number of rows in each batch
+BATCH_ROWS = 65536
+
+# end of a report's batches
+_DONE = object()
+
+
+def to_datetime(value):
+    """Return a datetime for a datetime or a date, at midnight as the CLI parses dates."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    raise NiseError(f'Expected a date or datetime, not {value!r}')
+
+
+def report_batches(cmd, start_date, end_date, clusterid=None, seed=None, batch_size=BATCH_ROWS):
+    """Generate the batches of every report of a sub-command, one report after the other.
+
+    Args:
+        cmd (str) sub-command, such as "ocp"
+        start_date (datetime or date) start of the report period
+        end_date (datetime or date) end of the report period
+        clusterid (str) cluster identifier. Default is a random word.
+        seed (int) seed for random values, or None
+        batch_size (int) maximum number of rows per batch
+
+    Yields:
+        (tuple) (report file name, Batch)
+    """
+    start_date, end_date = to_datetime(start_date), to_datetime(end_date)
+    if cmd not in GENERATORS:
+        raise NiseError(f"Unknown generator '{cmd}': expected one of {', '.join(GENERATORS)}")
+    generator_class = get_generator(cmd)
+    if seed is not None:
+        seed_all(seed)
+    else:
+        # discard the state of any seeded generation before this one
+        FAKE.seed(None)
+    if clusterid is None:
+        clusterid = FAKE.draw('word')
+
+    configs = load_configs(
+        cmd, seed=seed, report_month=start_date.month, report_year=start_date.year, clusterid=clusterid
+    )
+    for config in configs:
+        get_from_config('name', generator_class._period_start, config)['default'] = start_date
+        get_from_config('name', generator_class._period_end, config)['default'] = end_date
+    for config, generator in zip(configs, generator_class.report_set(configs)):
+        for batch in generator.batches(batch_size):
+            yield config.get('filename'), batch
+
+
+async def agenerate(
+    cmd, start_date, end_date, clusterid=None, seed=None, batch_size=BATCH_ROWS, lookahead=LOOKAHEAD
+):
+    """Asynchronously generate the batches of every report of a sub-command.
+
+    Batches are generated by report_batches() on a thread of its own, so
+    the event loop keeps running while rows are generated. At most
+    `lookahead` batches are generated ahead of the consumer, which bounds
+    memory use when the consumer is slower than the generator.
+
+    The fake value provider is shared by the whole process: seeded results
+    are reproducible when one generation runs at a time.
+
+    Args:
+        cmd (str) sub-command, such as "ocp"
+        start_date (datetime or date) start of the report period
+        end_date (datetime or date) end of the report period
+        clusterid (str) cluster identifier. Default is a random word.
+        seed (int) seed for random values, or None
+        batch_size (int) maximum number of rows per batch
+        lookahead (int) number of batches generated ahead of the consumer
+
+    Yields:
+        (tuple) (report file name, Batch)
+    """
+    loop = asyncio.get_running_loop()
+    batches = report_batches(cmd, start_date, end_date, clusterid, seed, batch_size)
+    pending = deque()
+    # a single thread, since a generator can only run one step at a time
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='nise') as executor:
+        try:
+            while True:
+                while len(pending) < max(1, lookahead):
+                    pending.append(loop.run_in_executor(executor, next, batches, _DONE))
+                item = await pending.popleft()
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            for future in pending:
+                future.cancel()
+            # wait for a running step, so the generator can be closed
+            await asyncio.gather(*pending, return_exceptions=True)
+            await loop.run_in_executor(executor, batches.close)
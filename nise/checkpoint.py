@@ -0,0 +1,190 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Checkpoints of generated report files, used to append to them."""
+
+import csv
+import gzip
+import io
+import json
+import os
+from collections import deque
+from datetime import datetime
+
+from nise.exceptions import NiseError
+from nise.util import LOG
+
+# bytes read from the end of a report file to find its last row
+TAIL_BYTES = 64 * 1024
+
+
+class Checkpoint:
+    """Where generation of a set of report files stopped.
+
+    Checkpoints are saved as JSON. They record how to rebuild the cluster
+    topology rather than the topology itself: a topology depends only on the
+    seed, the report templates and its sizes.
+
+    Attributes:
+        interval_end (datetime) end of the last generated usage interval
+        seed (int) seed of the run that generated the files, or None
+        clusterid (str) cluster id of the reports, or None
+        sizes (dict) number of entities of each kind in the cluster topology, or None
+        files (dict) size of each report file when the checkpoint was saved, in bytes, by file name
+    """
+
+    def __init__(self, interval_end, seed=None, clusterid=None, sizes=None, files=None):
+        """Initialize a checkpoint.
+
+        Args:
+            interval_end (datetime) end of the last generated usage interval
+            seed (int) seed of the run that generated the files, or None
+            clusterid (str) cluster id of the reports, or None
+            sizes (dict) number of entities of each kind in the cluster topology, or None
+            files (dict) size of each report file, in bytes, by file name, or None
+        """
+        self.interval_end = interval_end
+        self.seed = seed
+        self.clusterid = clusterid
+        self.sizes = sizes
+        self.files = files or {}
+
+    def to_dict(self):
+        """Return the checkpoint as a JSON-serializable dict."""
+        return {
+            'interval_end': self.interval_end.isoformat(),
+            'seed': self.seed,
+            'clusterid': self.clusterid,
+            'sizes': self.sizes,
+            'files': self.files,
+        }
+
+    @classmethod
+    def from_dict(cls, values):
+        """Return a checkpoint from a dict returned by to_dict()."""
+        return cls(
+            datetime.fromisoformat(values['interval_end']),
+            seed=values.get('seed'),
+            clusterid=values.get('clusterid'),
+            sizes=values.get('sizes'),
+            files=values.get('files'),
+        )
+
+
+def checkpoint_path(paths):
+    """Return the path of the checkpoint of a set of report files.
+
+    The checkpoint is a hidden file in the directory of the first report,
+    named after the common prefix of the report file names.
+    """
+    directory = os.path.dirname(paths[0])
+    prefix = os.path.commonprefix([os.path.basename(path) for path in paths]).rstrip('-_.') or 'reports'
+    return os.path.join(directory, f'.{prefix}.checkpoint')
+
+
+def save_checkpoint(paths, checkpoint):
+    """Save the checkpoint of a set of report files, recording the current size of each file."""
+    checkpoint.files = {os.path.basename(path): os.path.getsize(path) for path in paths}
+    target = checkpoint_path(paths)
+    partial = f'{target}.{os.getpid()}'
+    with open(partial, 'w') as output:
+        json.dump(checkpoint.to_dict(), output)
+    os.replace(partial, target)
+
+
+def load_checkpoint(paths):
+    """Load the checkpoint of a set of report files, or None if it is missing or out of date."""
+    try:
+        with open(checkpoint_path(paths)) as cached:
+            checkpoint = Checkpoint.from_dict(json.load(cached))
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+    sizes = {os.path.basename(path): os.path.getsize(path) if os.path.exists(path) else None for path in paths}
+    if checkpoint.files != sizes:
+        LOG.info(f'Ignoring checkpoint {checkpoint_path(paths)}: the report files changed after it was saved.')
+        return None
+    return checkpoint
+
+
+def open_compressed(path):
+    """Open a gzip or zstd compressed report file for reading text."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    import zstandard
+
+    reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True)
+    return io.TextIOWrapper(reader, encoding='utf-8', newline='')
+
+
+def read_last_interval(path, colname, colformat):
+    """Read the end of the last usage interval of a report file from its last row.
+
+    Args:
+        path (str) path of a CSV report file with a header
+        colname (str) name of the usage interval end column
+        colformat (str) format of the column, passed to datetime.strptime()
+
+    Returns:
+        (datetime) the last interval end, or None if the file has no rows
+    """
+    if path.endswith(('.gz', '.zst')):
+        # compressed files are read through to their last lines
+        with open_compressed(path) as report:
+            header = next(csv.reader([report.readline()]), [])
+            lines = [''] + [line.rstrip('\r\n') for line in deque(report, maxlen=1)]
+    else:
+        with open(path, 'rb') as report:
+            header = next(csv.reader([report.readline().decode('utf-8')]), [])
+            report.seek(0, os.SEEK_END)
+            report.seek(max(0, report.tell() - TAIL_BYTES))
+            lines = report.read().decode('utf-8', errors='replace').splitlines()
+    if colname not in header or len(lines) < 2:
+        return None
+    last = next(csv.reader([lines[-1]]))
+    if last == header:
+        return None
+    return datetime.strptime(last[header.index(colname)], colformat)
+
+
+def resume(paths, colname, colformat):
+    """Return where generation of a set of existing report files stopped.
+
+    The checkpoint saved with the files is used when it is up to date.
+    Otherwise, the last interval is read from the end of each file.
+
+    Args:
+        paths (list) paths of the report files
+        colname (str) name of the usage interval end column
+        colformat (str) format of the column, passed to datetime.strptime()
+
+    Returns:
+        (Checkpoint) where generation stopped, or None if no file exists or has rows
+    """
+    if not any(os.path.exists(path) for path in paths):
+        return None
+    checkpoint = load_checkpoint(paths)
+    if checkpoint is not None:
+        return checkpoint
+    ends = {
+        path: read_last_interval(path, colname, colformat) if os.path.exists(path) else None for path in paths
+    }
+    if len(set(ends.values())) > 1:
+        raise NiseError(f'Unable to append: report files end at different intervals: {ends}')
+    interval_end = ends[paths[0]]
+    if interval_end is None:
+        return None
+    LOG.info(f'No checkpoint for {checkpoint_path(paths)}: resuming after the last rows, at {interval_end}.')
+    return Checkpoint(interval_end)
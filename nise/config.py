@@ -16,14 +16,47 @@
 #
 """Nise configuration loader/parser."""
 
+import hashlib
 import os
+import pickle
 
-from jinja2 import Environment, FileSystemLoader, Template
-from util.log import LOG
+import yaml
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 
-from util.jinja_helpers import faker_passthrough
+from nise.util.fake import seed_all
+from nise.util.jinja_helpers import faker_passthrough
+from nise.util.log import LOG
 
 TEMPLATE_DIR = os.path.dirname(os.path.realpath(__file__)) + "/templates"
+CACHE_DIR = os.path.join(os.getenv('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'nise')
+
+_ENVIRONMENT = None
+
+
+def get_environment():
+    """Return the Jinja environment shared by this process.
+
+    Compiled templates are kept in memory for the life of the process and
+    in a bytecode cache under CACHE_DIR across processes. Cached bytecode is
+    discarded when the template source changes; in-memory templates are
+    reloaded when the template file's mtime changes.
+
+    Returns:
+        (jinja2.Environment) the shared environment
+    """
+    global _ENVIRONMENT
+    if _ENVIRONMENT is None:
+        bytecode_cache = None
+        cache_dir = os.path.join(CACHE_DIR, 'jinja')
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(cache_dir)
+        except OSError as exc:
+            LOG.debug(f'Jinja bytecode cache disabled: {exc}')
+
+        _ENVIRONMENT = Environment(loader=FileSystemLoader(TEMPLATE_DIR), bytecode_cache=bytecode_cache)
+        _ENVIRONMENT.globals['faker'] = faker_passthrough
+    return _ENVIRONMENT
 
 
 def load_template(template, **kwargs):
@@ -37,10 +70,80 @@ def load_template(template, **kwargs):
         (str) rendered template
     """
 
-    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
-    env.globals["faker"] = faker_passthrough
-    tmpl = env.get_template(template)
+    tmpl = get_environment().get_template(template)
 
     rendered = tmpl.render(**kwargs)
-    LOG.debug(f"Rendered template '{template}': {rendered}")
+    LOG.debug("Rendered template '%s': %s", template, rendered)
     return rendered
+
+
+def load_config(template, seed=None, **kwargs):
+    """Load a rendered and parsed template configuration.
+
+    Rendering a template draws random values, so parsed configurations are
+    only cached when a seed is given. The cache key covers the template
+    path and mtime, the render arguments and the seed; a cache hit skips
+    both Jinja and YAML.
+
+    Args:
+        template (str) relative path to a template in TEMPLATE_DIR
+        seed (int) seed used for random values, or None
+        kwargs (dict) keyword args required to render the template
+
+    Returns:
+        (dict) parsed configuration
+    """
+    cache_path = None
+    if seed is not None:
+        mtime = os.path.getmtime(os.path.join(TEMPLATE_DIR, template))
+        key = repr((template, mtime, sorted(kwargs.items()), seed))
+        cache_path = os.path.join(CACHE_DIR, 'config', hashlib.sha1(key.encode()).hexdigest() + '.pickle')
+        try:
+            with open(cache_path, 'rb') as cached:
+                config = pickle.load(cached)
+            LOG.debug(f"Loaded cached config for '{template}' from {cache_path}")
+            return config
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    config = yaml.load(load_template(template, **kwargs), Loader=loader)
+
+    if cache_path:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            partial = f'{cache_path}.{os.getpid()}'
+            with open(partial, 'wb') as cached:
+                pickle.dump(config, cached, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(partial, cache_path)
+        except OSError as exc:
+            LOG.debug(f"Unable to cache config for '{template}': {exc}")
+    return config
+
+
+def load_configs(cmd, seed=None, **kwargs):
+    """Load the rendered and parsed configurations of every template of a sub-command.
+
+    Templates are rendered in file name order. When seeded, the random
+    streams are restarted before each template, so each configuration
+    does not depend on the templates rendered before it.
+
+    Args:
+        cmd (str) sub-command, the directory of the templates in TEMPLATE_DIR
+        seed (int) seed used for random values, or None
+        kwargs (dict) keyword args required to render the templates
+
+    Returns:
+        (list) parsed configurations
+    """
+    configs = []
+    for fname in sorted(os.listdir(os.path.join(TEMPLATE_DIR, cmd))):
+        if os.path.splitext(fname)[1] != '.yaml':
+            continue
+        if seed is not None:
+            seed_all(seed)
+        LOG.debug(f'Loading: {TEMPLATE_DIR}/{cmd}/{fname}')
+        ymldict = load_config(f'{cmd}/{fname}', seed=seed, **kwargs)
+        LOG.debug(f'Rendered YAML: {ymldict}')
+        configs.append(ymldict)
+    return configs
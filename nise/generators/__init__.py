@@ -14,6 +14,21 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
-"""Registry of generator classes."""
+"""Registry of generator classes.
 
-from .ocp import OCPGenerator
+Generator modules are imported on first use, so that only the generator for
+the requested sub-command is loaded.
+"""
+
+import importlib
+
+# sub-command name -> (module, class name)
+GENERATORS = {
+    'ocp': ('.ocp', 'OCPGenerator'),
+}
+
+
+def get_generator(name):
+    """Import and return the generator class registered for a sub-command."""
+    module, classname = GENERATORS[name]
+    return getattr(importlib.import_module(module, __name__), classname)
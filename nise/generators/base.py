@@ -16,15 +16,21 @@
 #
 """Base Generator."""
 
-import csv
-import random
+import functools
+import itertools
 import re
-from datetime import datetime
+from collections import OrderedDict
 
-from faker import Faker
+import numpy as np
 
-from util import LOG
-from exceptions import NiseError, NiseGeneratorError
+from nise.exceptions import NiseError, NiseGeneratorError
+from nise.util import LOG
+from nise.util.fake import FAKE
+from .batch import Batch, DictionaryArray, MAX_DICTIONARY, constant, format_columns
+from .text import compile_template, escape
+
+# compiled plans kept per generator, for the columns most recently passed in through send()
+MAX_PLANS = 16
 
 
 def count_brackets(somestr):
@@ -49,9 +55,28 @@ class BaseGenerator:
                     raise NiseGeneratorError("Something unexpected happened!")
 
                 return generated_column_value
+
+        Sub-classes may also implement compile_SOMETYPE(**kwargs), which is
+        called once per column definition and returns a zero-argument callable
+        producing the column value. When present, it takes precedence over
+        gen_SOMETYPE().
+
+        For batches(), sub-classes may implement compile_batch_SOMETYPE(**kwargs),
+        returning a callable that takes (start, size) and returns one column of
+        `size` values for the rows starting at row `start`. Column types without
+        one fall back to calling the row plan `size` times.
+
+        For text_lines(), sub-classes may implement compile_text_SOMETYPE(**kwargs),
+        returning either a constant CSV field or a zero-argument callable returning
+        an escaped CSV field. Column types without one escape each value of the
+        row plan. Date-based generators may also return an IntervalField,
+        computing the fields of a whole interval at once.
     """
 
-    FAKE = Faker()
+    FAKE = FAKE
+
+    # ColumnProfiler instrumenting compiled columns, or None
+    profiler = None
 
     def __init__(self, config):
         """Constructor.
@@ -85,9 +110,22 @@ class BaseGenerator:
 
         """
         self.config = config
+        self._plans = OrderedDict()
         filename = self.config.get("filename")
+        # random streams of this report, restarted without affecting other reports
+        self.FAKE = FAKE.fork(filename or '')
         LOG.info(f"Generator initialized for file: {filename}")
 
+    @property
+    def rng(self):
+        """Return the NumPy random number generator used for batches."""
+        return self.FAKE.rng
+
+    @property
+    def row_count(self):
+        """Number of rows to generate, or None if unbounded."""
+        return None
+
     @property
     def header(self):
         """return a CSV header"""
@@ -95,36 +133,235 @@ class BaseGenerator:
         LOG.debug(f"Header: {header}")
         return header
 
+    @property
+    def column_types(self):
+        """Return the configured type of each column."""
+        return [col['type'] for col in self.config.get('columns')]
+
     def lines(self):
         """Generator function to emit randomized CSV lines
 
         send() can be used to propagate a new column definition into the generator that is used on
         the next iteration.
 
-        throw() will raise the given exception, except NiseGeneratorError and AttributeError
+        throw() will raise the given exception, except NiseGeneratorError
         """
-        output = []
         sent = None
-        while True:
-            output = []
-            columns = sent if sent else self.config.get("columns")
-            for col in columns:
-                self.validate(col)
-                # if type=FOO, call self.gen_FOO(**col)
-                result = col.get("default")
+        try:
+            default_plan = self.compile(self.config.get('columns'))
+        except NiseGeneratorError as exc:
+            LOG.info(exc)
+            return None  # stop iterating
+        for _ in self._rows():
+            try:
+                plan = self.compile(sent) if sent else default_plan
+                output = [gen() for gen in plan]
+            except NiseGeneratorError as exc:
+                LOG.info(exc)
+                return None  # stop iterating
+            LOG.debug('Generated Line: %s', output)
+            sent = yield output
+
+    def text_lines(self):
+        """Emit CSV-formatted lines.
+
+        Rows are the same as the rows of lines(), but each one is formatted
+        with a single operation on a line template compiled by compile_text(),
+        from a tuple of the non-constant fields, without passing through
+        csv.writer. Column definitions cannot be changed with send().
+        """
+        try:
+            template, fields = self.compile_text(self.config.get('columns'))
+        except NiseGeneratorError as exc:
+            LOG.info(exc)
+            return None  # stop iterating
+        for _ in self._rows():
+            try:
+                line = template % tuple([gen() for gen in fields])
+            except NiseGeneratorError as exc:
+                LOG.info(exc)
+                return None  # stop iterating
+            yield line
+
+    def _rows(self):
+        """Iterate once per row to generate, preparing generator state for each row.
+
+        Sub-classes may override this to bound iteration or track row state
+        read by their compiled columns.
+        """
+        return itertools.repeat(None)
+
+    def compile(self, columns):
+        """Compile column definitions into a row plan.
+
+        A row plan is a list of zero-argument callables, one per column. Plans
+        are cached by the column definitions used to build them, so columns
+        passed in through send() are only recompiled when they change. Only the
+        MAX_PLANS most recently used plans are kept.
+
+        Args:
+            columns (list) a list of column definitions
+
+        Returns:
+            (list) callables returning one value per column
+        """
+        key = repr(columns)
+        plan = self._cached_plan(key)
+        if plan is None:
+            plan = [self.compile_column(col) for col in columns]
+            if self.profiler is not None:
+                plan = [self._instrument(col, gen, 'compile', 'gen') for col, gen in zip(columns, plan)]
+            self._cache_plan(key, plan)
+        return plan
+
+    def compile_text(self, columns):
+        """Compile column definitions into a CSV line template.
+
+        Constant fields are written into the template, so only the other
+        columns are called for each row.
+
+        Args:
+            columns (list) a list of column definitions
+
+        Returns:
+            (tuple) (template, callables) as returned by text.compile_template()
+        """
+        key = 'text:' + repr(columns)
+        plan = self._cached_plan(key)
+        if plan is None:
+            fields = [self.compile_text_column(col) for col in columns]
+            if self.profiler is not None:
+                fields = [
+                    self._instrument(col, field, 'compile_text', 'compile', 'gen') if callable(field) else field
+                    for col, field in zip(columns, fields)
+                ]
+            plan = compile_template(fields)
+            self._cache_plan(key, plan)
+        return plan
+
+    def _cached_plan(self, key):
+        """Return the plan cached under a key, or None, marking it as most recently used."""
+        plan = self._plans.get(key)
+        if plan is not None:
+            self._plans.move_to_end(key)
+        return plan
+
+    def _cache_plan(self, key, plan):
+        """Cache a plan under a key, evicting the least recently used plan beyond MAX_PLANS."""
+        self._plans[key] = plan
+        if len(self._plans) > MAX_PLANS:
+            self._plans.popitem(last=False)
+
+    def compile_text_column(self, column):
+        """Resolve a column definition to a constant CSV field or a callable returning one."""
+        self.validate(column)
+        compiler = getattr(self, f"compile_text_{column.get('type')}", None)
+        if compiler:
+            return compiler(**column)
+        return self._compile_text_value(column)
+
+    def _compile_text_value(self, column):
+        """Compile a column's row plan callable into a callable returning escaped CSV fields."""
+        gen = self.compile_column(column)
+        return lambda: escape(gen())
+
+    def compile_column(self, column):
+        """Resolve a column definition to a zero-argument callable."""
+        self.validate(column)
+        coltype = column.get('type')
+
+        # if type=FOO, use self.compile_FOO(**col) or self.gen_FOO(**col)
+        compiler = getattr(self, f'compile_{coltype}', None)
+        if compiler:
+            return compiler(**column)
+
+        colname = column.get('name')
+        default = column.get('default')
+        method = getattr(self, f'gen_{coltype}', None)
+        if method:
+
+            def gen():
                 try:
-                    coltype = col.get("type")
-                    result = getattr(self, f"gen_{coltype}")(**col)
-                except NiseGeneratorError as exc:
-                    LOG.info(exc)
-                    return None  # stop iterating
+                    return method(**column)
                 except AttributeError as exc:
-                    colname = col.get("name")
-                    LOG.info(f"A problem occurred generating columns of type '{coltype}'. Using default value for column '{colname}'.")
+                    LOG.info(
+                        f"A problem occurred generating columns of type '{coltype}'. "
+                        f"Using default value for column '{colname}'."
+                    )
                     LOG.debug(exc)
-                output.append(result)
-            LOG.debug(f"Generated Line: {output}")
-            sent = yield output
+                    return default
+
+            return gen
+
+        LOG.info(
+            f"A problem occurred generating columns of type '{coltype}'. Using default value for column '{colname}'."
+        )
+        return lambda: default
+
+    def batches(self, size=65536):
+        """Emit column-oriented batches of rows.
+
+        Each batch holds up to `size` rows, with one array per column. Iteration
+        stops after row_count rows, or when a column can no longer be generated.
+
+        Args:
+            size (int) maximum number of rows per batch
+
+        Yields:
+            (Batch) a batch of generated rows
+        """
+        columns = self.config.get('columns')
+        names = [col['name'] for col in columns]
+        total = self.row_count
+        start = 0
+        try:
+            plan = [self.compile_batch_column(col) for col in columns]
+            if self.profiler is not None:
+                plan = [
+                    self._instrument(col, gen, 'compile_batch', 'compile', 'gen') for col, gen in zip(columns, plan)
+                ]
+        except NiseGeneratorError as exc:
+            LOG.info(exc)
+            return None  # stop iterating
+        while total is None or start < total:
+            count = size if total is None else min(size, total - start)
+            try:
+                batch = Batch(names, [gen(start, count) for gen in plan])
+            except NiseGeneratorError as exc:
+                LOG.info(exc)
+                return None  # stop iterating
+            LOG.debug('Generated Batch: %s rows', count)
+            yield batch
+            start += count
+
+    def compile_batch_column(self, column):
+        """Resolve a column definition to a callable producing column arrays."""
+        self.validate(column)
+        coltype = column.get('type')
+
+        compiler = getattr(self, f'compile_batch_{coltype}', None)
+        if compiler:
+            return compiler(**column)
+
+        gen = self.compile_column(column)
+        return lambda start, size: np.array([gen() for _ in range(size)], dtype=object)
+
+    def _instrument(self, column, func, *prefixes):
+        """Wrap a compiled column with the profiler, naming it after the method that compiled it.
+
+        Args:
+            column (dict) column definition
+            func (callable) the compiled column
+            prefixes (str) method name prefixes, in the order compile_column() looks them up
+        """
+        coltype = column.get('type')
+        for prefix in prefixes:
+            if hasattr(self, f'{prefix}_{coltype}'):
+                method = f'{prefix}_{coltype}'
+                break
+        else:
+            method = 'default'
+        return self.profiler.instrument(self.config.get('filename'), column.get('name'), method, func)
 
     def validate(self, column):
         """Validate column configuration."""
@@ -142,19 +379,69 @@ class BaseGenerator:
         if default:
             return default
         name = kwargs.get("name")
-        raise NiseGeneratorError("No default value defined for column '{name}'.")
+        raise NiseGeneratorError(f"No default value defined for column '{name}'.")
+
+    def _compile_default(self, **kwargs):
+        """Compile a callable returning the default value."""
+        default = kwargs.get('default')
+        if default:
+            return lambda: default
+        return functools.partial(self._return_default, **kwargs)
 
     def gen_string(self, **kwargs):
         """Generate string values."""
         colformat = kwargs.get("format")
         if colformat:
             if kwargs.get("seed"):
-                generated = [random.choice(kwargs.get("seed")) for _ in range(0, count_brackets(colformat))]
+                generated = [self.FAKE.random.choice(kwargs.get('seed')) for _ in range(0, count_brackets(colformat))]
             else:
-                generated = [self.FAKE.word() for _ in range(0, count_brackets(colformat))]
+                generated = [self.FAKE.draw('word') for _ in range(0, count_brackets(colformat))]
             return kwargs.get("format").format(*generated)
         return self._return_default(**kwargs)
 
+    def compile_string(self, **kwargs):
+        """Compile a string column, resolving its format and seed once."""
+        colformat = kwargs.get('format')
+        if not colformat:
+            return self._compile_default(**kwargs)
+
+        fields = range(0, count_brackets(colformat))
+        values = kwargs.get('seed') or self.FAKE.pool('word')
+        choice = self.FAKE.random.choice
+        return lambda: colformat.format(*[choice(values) for _ in fields])
+
+    def compile_batch_string(self, **kwargs):
+        """Compile a vectorized string column.
+
+        Formatted values are dictionary-encoded when every combination of
+        seed values fits in a dictionary of MAX_DICTIONARY entries.
+        """
+        colformat = kwargs.get('format')
+        if not colformat:
+            default = self._return_default(**kwargs)
+            return lambda start, size: constant(default, size)
+
+        nfields = count_brackets(colformat)
+        if not nfields:
+            value = colformat.format()
+            return lambda start, size: constant(value, size)
+
+        values = kwargs.get('seed') or self.FAKE.pool('word')
+        if len(values) ** nfields <= MAX_DICTIONARY:
+            combos = itertools.product(values, repeat=nfields)
+            dictionary = np.array([colformat.format(*combo) for combo in combos], dtype=object)
+            return lambda start, size: DictionaryArray(self.rng.integers(0, len(dictionary), size), dictionary)
+
+        if kwargs.get('seed'):
+            values = np.array(values, dtype=object)
+
+            def draws(size):
+                return values[self.rng.integers(0, len(values), size)]
+
+        else:
+            draws = functools.partial(self.FAKE.draws, 'word')
+        return lambda start, size: format_columns(colformat, [draws(size) for _ in range(nfields)])
+
     def gen_datetime(self, **kwargs):
         """Generate datetime values.
 
@@ -165,7 +452,7 @@ class BaseGenerator:
         """
         colformat = kwargs.get("format")
         if colformat:
-            return self.FAKE.date(pattern=colformat)
+            return self.FAKE.call('date', pattern=colformat)
         return self._return_default(**kwargs)
 
     def gen_calc(self, **kwargs):
@@ -173,4 +460,18 @@ class BaseGenerator:
 
         Sub-classes should override this method.
         """
-        return self.FAKE.random_digit()
+        return self.FAKE.random.randrange(10)
+
+    def compile_calc(self, **kwargs):
+        """Compile a calculated column.
+
+        Sub-classes should override this method or gen_calc().
+        """
+        return functools.partial(self.gen_calc, **kwargs)
+
+    def compile_batch_calc(self, **kwargs):
+        """Compile a vectorized calculated column.
+
+        Sub-classes should override this method.
+        """
+        return lambda start, size: self.rng.integers(0, 10, size)
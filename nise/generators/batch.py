@@ -0,0 +1,198 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Column-oriented batches of generated rows."""
+
+from string import Formatter
+
+import numpy as np
+
+# largest dictionary built for a dictionary-encoded column
+MAX_DICTIONARY = 65536
+
+
+class DictionaryArray:
+    """A dictionary-encoded column.
+
+    Each value is stored as an integer code indexing into an array of
+    distinct values.
+    """
+
+    __slots__ = ['codes', 'dictionary']
+
+    def __init__(self, codes, dictionary):
+        """Initialize a dictionary-encoded column.
+
+        Args:
+            codes (numpy.ndarray) integer codes, one per row
+            dictionary (numpy.ndarray) distinct column values
+        """
+        self.codes = codes
+        self.dictionary = dictionary
+
+    def __len__(self):
+        """Return the number of rows."""
+        return len(self.codes)
+
+    def decode(self):
+        """Return the column values as an array."""
+        return self.dictionary[self.codes]
+
+
+class TimestampArray:
+    """A typed timestamp column with the format used to render it as text."""
+
+    __slots__ = ['values', 'format']
+
+    def __init__(self, values, fmt):
+        """Initialize a timestamp column.
+
+        Args:
+            values (numpy.ndarray) datetime64 values, one per row
+            fmt (str) format passed to datetime.strftime()
+        """
+        self.values = values
+        self.format = fmt
+
+    def __len__(self):
+        """Return the number of rows."""
+        return len(self.values)
+
+    def decode(self):
+        """Return the column values as an array of formatted strings."""
+        unique, inverse = np.unique(self.values, return_inverse=True)
+        formatted = np.array([value.strftime(self.format) for value in unique.astype(object)], dtype=object)
+        return formatted[inverse]
+
+
+def decode(column):
+    """Return the values of any batch column as an array."""
+    if isinstance(column, (DictionaryArray, TimestampArray)):
+        return column.decode()
+    return column
+
+
+def constant(value, size):
+    """Return a dictionary-encoded column repeating one value."""
+    return DictionaryArray(np.zeros(size, dtype=np.int32), np.array([value], dtype=object))
+
+
+def to_datetime64(value):
+    """Convert a datetime into a numpy datetime64 in UTC."""
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None) - value.utcoffset()
+    return np.datetime64(value, 's')
+
+
+def _check_numbering(parsed, numbering=None):
+    """Raise ValueError, as str.format() does, if a format mixes {} and {0} fields.
+
+    Args:
+        parsed (list) the (literal, field name, spec, conversion) tuples of string.Formatter.parse()
+        numbering (bool) whether earlier fields were automatically numbered, or None if there were none
+
+    Returns:
+        (bool) whether the fields are automatically numbered, or None if there are none
+    """
+    for _, field_name, spec, _ in parsed:
+        if field_name is None:
+            continue
+        automatic = not field_name or field_name[0] in '.['
+        if numbering is None:
+            numbering = automatic
+        elif automatic and not numbering:
+            raise ValueError('cannot switch from manual field specification to automatic field numbering')
+        elif numbering and not automatic:
+            raise ValueError('cannot switch from automatic field numbering to manual field specification')
+        if '{' in spec:
+            numbering = _check_numbering(Formatter().parse(spec), numbering)
+    return numbering
+
+
+def format_columns(colformat, fields):
+    """Vectorized str.format() over whole columns.
+
+    Literal text and plain fields are concatenated column by column. Fields
+    with a format spec or a conversion, such as {:03d} or {!r}, are formatted
+    value by value, as str.format() formats them. Formats with attribute,
+    item or nested fields are formatted row by row with str.format(). Like
+    str.format(), formats mixing {} and {0} fields raise ValueError.
+
+    Args:
+        colformat (str) a format string with automatically numbered {} or explicitly indexed {0} fields
+        fields (list) one array of values per positional argument of the format
+
+    Returns:
+        (numpy.ndarray) formatted strings
+    """
+    formatter = Formatter()
+    parsed = list(formatter.parse(colformat))
+    _check_numbering(parsed)
+    if any(
+        field_name is not None and (field_name and not field_name.isdigit() or '{' in spec)
+        for _, field_name, spec, _ in parsed
+    ):
+        return np.array([colformat.format(*row) for row in zip(*fields)], dtype=object)
+
+    result = None
+    auto_index = 0
+    for literal, field_name, spec, conversion in parsed:
+        pieces = []
+        if literal:
+            pieces.append(literal)
+        if field_name is not None:
+            if field_name:
+                column = fields[int(field_name)]
+            else:
+                column = fields[auto_index]
+                auto_index += 1
+            if spec or conversion:
+                values = [formatter.format_field(formatter.convert_field(value, conversion), spec) for value in column]
+                pieces.append(np.array(values, dtype=str))
+            else:
+                pieces.append(column.astype(str))
+        for piece in pieces:
+            result = piece if result is None else np.char.add(result, piece)
+    return result.astype(object)
+
+
+class Batch:
+    """A column-oriented batch of generated rows."""
+
+    __slots__ = ['names', 'columns']
+
+    def __init__(self, names, columns):
+        """Initialize a batch.
+
+        Args:
+            names (list) column names
+            columns (list) one array per column: numpy.ndarray, DictionaryArray or TimestampArray
+        """
+        self.names = names
+        self.columns = columns
+
+    def __len__(self):
+        """Return the number of rows."""
+        return len(self.columns[0]) if self.columns else 0
+
+    def __getitem__(self, name):
+        """Return the column with a name."""
+        return self.columns[self.names.index(name)]
+
+    def rows(self):
+        """Iterate over the batch as lists of row values."""
+        values = [decode(column).tolist() for column in self.columns]
+        return (list(row) for row in zip(*values))
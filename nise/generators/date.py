@@ -16,9 +16,57 @@
 #
 """Date-based Generators."""
 
+from datetime import timedelta
+from itertools import islice, repeat
+
+import numpy as np
+
+from nise.exceptions import NiseGeneratorError
+from nise.util import DateHelper, LOG, get_from_config
 from .base import BaseGenerator
-from exceptions import NiseGeneratorError
-from util import DateHelper, get_from_config, LOG
+from .batch import TimestampArray, to_datetime64
+from .text import IntervalField, escape, escape_all
+
+
+# number of hourly intervals in a block of rows sharing one random stream
+BLOCK_HOURS = 24
+
+
+class Timeline:
+    """Hourly usage interval boundaries from a starting datetime.
+
+    Boundaries are stored as an array of epoch hours. Formatted strings are
+    built once per format, so rows index into the timeline instead of
+    formatting datetimes.
+    """
+
+    def __init__(self, start, intervals):
+        """Initialize a timeline.
+
+        Args:
+            start (datetime) start of the first interval
+            intervals (int) number of hourly intervals
+        """
+        self.start = start
+        origin = to_datetime64(start).astype('datetime64[h]').astype(np.int64)
+        self.hours = np.arange(intervals + 1, dtype=np.int64) + origin
+        self._formatted = {}
+
+    def __len__(self):
+        """Return the number of intervals."""
+        return len(self.hours)
+
+    def datetime(self, index):
+        """Return the datetime of a boundary."""
+        return self.start + timedelta(hours=index)
+
+    def format(self, fmt):
+        """Return every boundary formatted with datetime.strftime()."""
+        strings = self._formatted.get(fmt)
+        if strings is None:
+            strings = [self.datetime(index).strftime(fmt) for index in range(len(self.hours))]
+            self._formatted[fmt] = strings
+        return strings
 
 
 class ChronoGenerator(BaseGenerator):
@@ -28,7 +76,18 @@ class ChronoGenerator(BaseGenerator):
         start_date <= generated_date <= end_date
 
     Each iteration of this generator will generate values in chronological
-    order from start_date to end_date in 1-hour increments.
+    order from start_date to end_date in 1-hour increments. Sub-classes may
+    emit several rows for each interval by overriding rows_per_interval.
+
+    Generation may be restricted to a sub-range of the report period by passing
+    interval_start and interval_end. Report period columns are unaffected, so
+    the rows of consecutive sub-ranges are identical to the rows of one
+    generator covering the whole period.
+
+    When the fake value provider is seeded, the generator's own random
+    streams are restarted at every block of BLOCK_HOURS intervals after
+    start_date, so that sub-ranges starting on a block boundary reproduce the
+    same random values, whether or not other reports are generated alongside.
     """
 
     #
@@ -43,8 +102,15 @@ class ChronoGenerator(BaseGenerator):
     _usage_start = "usage_start"
     _usage_end = "usage_end"
 
-    def __init__(self, config):
-        """Constructor."""
+    def __init__(self, config, interval_start=None, interval_end=None, timeline=None):
+        """Constructor.
+
+        Args:
+            config (dict) compiled configuration
+            interval_start (datetime) start of the first usage interval. Default is start_date.
+            interval_end (datetime) latest end of the last usage interval. Default is end_date.
+            timeline (Timeline) timeline shared with generators of the same interval range
+        """
         # billing period dates (e.g. Jan 1 1900 - Jan 31 1900)
         self.start_date = get_from_config("name", self._period_start, config).get("default")
         self.end_date = get_from_config("name", self._period_end, config).get("default")
@@ -53,54 +119,205 @@ class ChronoGenerator(BaseGenerator):
         self.period_end_format = get_from_config("name", self._period_end, config).get("format")
 
         # usage period dates (e.g. Jan 1 1900 12:00:00 - Jan 1 1900 13:00:00)
-        self.last_usage_interval_start = None
-        self.last_usage_interval_end = None
+        self.interval_start = interval_start or self.start_date
+        self.interval_end = interval_end or self.end_date
 
         self.usage_start_format = get_from_config("name", self._usage_start, config).get("format")
         self.usage_end_format = get_from_config("name", self._usage_end, config).get("format")
 
         self.datehelper = DateHelper()
+        self.timeline = timeline or Timeline(self.interval_start, self.intervals)
+
+        # interval and entity of the row being generated
+        self._interval = 0
+        self._entity = 0
 
         super().__init__(config)
 
+    @property
+    def intervals(self):
+        """Number of hourly usage intervals between interval_start and interval_end."""
+        return int((self.interval_end - self.interval_start) / self.datehelper.one_hour)
+
+    @property
+    def rows_per_interval(self):
+        """Number of rows generated for each usage interval."""
+        return 1
+
+    @property
+    def row_count(self):
+        """Number of rows between interval_start and interval_end."""
+        return self.intervals * self.rows_per_interval
+
+    def shard_kwargs(self):
+        """Return keyword args for generators of sub-ranges of this generator's intervals.
+
+        Sub-classes should return any state that shard generators must share.
+        """
+        return {}
+
+    def _intervals(self):
+        """Iterate over the intervals.
+
+        When the fake value provider is seeded, its random streams are
+        restarted before the first row of each block.
+        """
+        seeded = self.FAKE.seeded
+        offset = int((self.interval_start - self.start_date) / self.datehelper.one_hour)
+        for interval in range(self.intervals):
+            if seeded and (offset + interval) % BLOCK_HOURS == 0:
+                self.FAKE.reseed((offset + interval) // BLOCK_HOURS)
+            self._interval = interval
+            yield interval
+
+    def _rows(self):
+        """Iterate over the intervals, and the rows of each interval."""
+        entities = range(self.rows_per_interval)
+        for _ in self._intervals():
+            for entity in entities:
+                self._entity = entity
+                yield entity
+
+    def text_lines(self):
+        """Emit CSV-formatted lines, formatting one interval at a time.
+
+        Rows are the same as the rows of lines(). IntervalField columns
+        compute the fields of every row of an interval at once. Other columns
+        are called row by row, in the same order as lines() calls them, and
+        their fields are collected per column. The columns are then zipped
+        and mapped onto the line template: zip() reuses its result tuple when
+        the template has consumed it, so no list or tuple is built per row.
+        Column definitions cannot be changed with send().
+        """
+        try:
+            template, fields = self.compile_text(self.config.get('columns'))
+        except NiseGeneratorError as exc:
+            LOG.info(exc)
+            return None  # stop iterating
+        row_fields = [field for field in fields if not isinstance(field, IntervalField)]
+        entities = range(self.rows_per_interval)
+        format_line = template.__mod__
+        for _ in self._intervals():
+            try:
+                row_values = [[] for _ in row_fields]
+                if row_values:
+                    for entity in entities:
+                        self._entity = entity
+                        for values, field in zip(row_values, row_fields):
+                            values.append(field())
+                if fields:
+                    row_values = iter(row_values)
+                    columns = [
+                        field.rows() if isinstance(field, IntervalField) else next(row_values) for field in fields
+                    ]
+                    lines = list(map(format_line, zip(*columns)))
+                else:
+                    lines = [template] * len(entities)
+            except NiseGeneratorError as exc:
+                LOG.info(exc)
+                return None  # stop iterating
+            yield from lines
+
     def _check_date(self, value):
         if self.start_date <= value and value <= self.end_date:
             return True
         raise NiseGeneratorError(f"Date value {value} is after end date {self.end_date}")
 
-    def gen_datetime(self, **kwargs):
-        """Generate datetime values."""
+    def compile_datetime(self, **kwargs):
+        """Compile a datetime column into a callable for its report column."""
         colname = kwargs.get("name")
 
         if colname == self._period_start:
             self._check_date(self.start_date)
-            return self.start_date.strftime(self.period_start_format)
+            value = self.start_date.strftime(self.period_start_format)
+            return lambda: value
 
         if colname == self._period_end:
             self._check_date(self.end_date)
-            return self.end_date.strftime(self.period_end_format)
+            value = self.end_date.strftime(self.period_end_format)
+            return lambda: value
 
         if colname == self._usage_start:
-            if self.last_usage_interval_start:
-                nextval = self.last_usage_interval_start + self.datehelper.one_hour
-                self._check_date(nextval)
-                self.last_usage_interval_start = nextval
-                return nextval.strftime(self.usage_start_format)
-            else:
-                self._check_date(self.start_date)
-                self.last_usage_interval_start = self.start_date
-                return self.last_usage_interval_start.strftime(self.usage_start_format)
+            starts = self.timeline.format(self.usage_start_format)
+            return lambda: starts[self._interval]
 
         if colname == self._usage_end:
-            if self.last_usage_interval_end:
-                nextval = self.last_usage_interval_end + self.datehelper.one_hour
-                self._check_date(nextval)
-                self.last_usage_interval_end = nextval
-                return nextval.strftime(self.usage_end_format)
-            else:
-                nextval = self.start_date + self.datehelper.one_hour
-                self._check_date(nextval)
-                self.last_usage_interval_end = nextval
-                return nextval.strftime(self.usage_end_format)
+            ends = self.timeline.format(self.usage_end_format)
+            return lambda: ends[self._interval + 1]
 
         raise NiseGeneratorError(f"Unknown datetime column, '{colname}'. Unable to generate a value.")
+
+    def compile_batch_datetime(self, **kwargs):
+        """Compile a vectorized datetime column.
+
+        Row N of the generated data covers the usage interval starting
+        N // rows_per_interval hours after interval_start.
+        """
+        colname = kwargs.get('name')
+
+        if colname == self._period_start:
+            self._check_date(self.start_date)
+            value, colformat = to_datetime64(self.start_date), self.period_start_format
+            return lambda start, size: TimestampArray(np.full(size, value), colformat)
+
+        if colname == self._period_end:
+            self._check_date(self.end_date)
+            value, colformat = to_datetime64(self.end_date), self.period_end_format
+            return lambda start, size: TimestampArray(np.full(size, value), colformat)
+
+        if colname == self._usage_start:
+            offset, colformat = 0, self.usage_start_format
+        elif colname == self._usage_end:
+            offset, colformat = 1, self.usage_end_format
+        else:
+            raise NiseGeneratorError(f"Unknown datetime column, '{colname}'. Unable to generate a value.")
+
+        hours = self.timeline.hours.astype('datetime64[h]').astype('datetime64[s]')
+        per_interval = self.rows_per_interval
+        return lambda start, size: TimestampArray(
+            hours[np.arange(start, start + size) // per_interval + offset], colformat
+        )
+
+    def compile_text_datetime(self, **kwargs):
+        """Compile a datetime column into a constant CSV field, or an IntervalField of escaped interval strings."""
+        colname = kwargs.get('name')
+
+        if colname in (self._period_start, self._period_end):
+            return escape(self.compile_datetime(**kwargs)())
+
+        if colname == self._usage_start:
+            starts = escape_all(self.timeline.format(self.usage_start_format))
+            return IntervalField(
+                lambda: starts[self._interval], lambda: repeat(starts[self._interval], self.rows_per_interval)
+            )
+
+        if colname == self._usage_end:
+            ends = escape_all(self.timeline.format(self.usage_end_format))
+            return IntervalField(
+                lambda: ends[self._interval + 1], lambda: repeat(ends[self._interval + 1], self.rows_per_interval)
+            )
+
+        raise NiseGeneratorError(f"Unknown datetime column, '{colname}'. Unable to generate a value.")
+
+    def gen_datetime(self, **kwargs):
+        """Generate datetime values."""
+        return self.compile_datetime(**kwargs)()
+
+
+def interleave(generators, method='lines'):
+    """Walk the intervals of several generators in a single pass.
+
+    The generators must cover the same interval range. For each interval,
+    the rows of every generator are yielded in turn.
+
+    Args:
+        generators (list) ChronoGenerator instances
+        method (str) name of the generator method emitting rows: "lines" or "text_lines"
+
+    Yields:
+        (tuple) (index of the generator, list of the generator's rows for one interval)
+    """
+    iterators = [getattr(generator, method)() for generator in generators]
+    for _ in range(generators[0].intervals):
+        for index, (generator, rows) in enumerate(zip(generators, iterators)):
+            yield index, list(islice(rows, generator.rows_per_interval))
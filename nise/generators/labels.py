@@ -0,0 +1,87 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Interned label sets for tag columns."""
+
+import sys
+from itertools import product
+
+# maximum number of distinct label sets built for one tag column
+MAX_LABEL_SETS = 1024
+
+
+class LabelSets:
+    """The finite set of label strings built from a tag column's seed.
+
+    Config Definition:
+        { "name": "pod_labels",
+          "type": "tag",
+          "format": {"key": "label_{}", "value": "{}", "separator": "|"},
+          "seed": [{"key": ["value", "value", ...]}, {...}]
+        }
+
+        The format may also be a single "key:value" format string, such as
+        'label_{}:{}', with the separator as a column field.
+
+    Each label set holds at most one value per seed key. Label strings are
+    built and interned once; entities refer to them by index.
+    """
+
+    def __init__(self, column, rng, limit=MAX_LABEL_SETS):
+        """Initialize the label sets of a column.
+
+        Args:
+            column (dict) a tag column definition
+            rng (random.Random) random source used to sample label sets
+            limit (int) maximum number of label sets
+        """
+        colformat = column.get('format') or '{}:{}'
+        separator = column.get('separator', '|')
+        if isinstance(colformat, dict):
+            separator = colformat.get('separator', separator)
+            colformat = f"{colformat.get('key', '{}')}:{colformat.get('value', '{}')}"
+
+        # one list of candidate "key:value" pairs per key; None omits the key
+        choices = []
+        for entry in column.get('seed') or []:
+            for key, values in entry.items():
+                choices.append([None] + [colformat.format(key, value) for value in values])
+
+        total = 1
+        for candidates in choices:
+            total *= len(candidates)
+
+        if total <= limit:
+            combos = list(product(*choices))
+        else:
+            seen = set()
+            for _ in range(limit * 10):
+                if len(seen) >= limit:
+                    break
+                seen.add(tuple(rng.choice(candidates) for candidates in choices))
+            combos = sorted(seen, key=lambda combo: [pair or '' for pair in combo])
+
+        label_sets = [separator.join(pair for pair in combo if pair) for combo in combos]
+        self.label_sets = [sys.intern(labels) for labels in label_sets if labels]
+        self.rng = rng
+
+    def __len__(self):
+        """Return the number of label sets."""
+        return len(self.label_sets)
+
+    def assign(self, count):
+        """Return a random label set index for each of `count` entities."""
+        return [self.rng.randrange(len(self.label_sets)) for _ in range(count)]
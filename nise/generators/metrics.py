@@ -0,0 +1,190 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Vectorized OpenShift usage metrics."""
+
+import numpy as np
+
+# seconds in one hourly usage interval
+INTERVAL_SECONDS = 3600
+
+GIBIBYTE = 1024 ** 3
+
+# node sizes: (cpu cores, memory bytes)
+NODE_SIZES = [(4, 16 * GIBIBYTE), (8, 32 * GIBIBYTE), (16, 64 * GIBIBYTE), (32, 128 * GIBIBYTE)]
+
+# share of a node's capacity allocatable to pods, after system reservations
+ALLOCATABLE = 0.9
+
+# persistent volume claim sizes, in bytes
+VOLUME_SIZES = [10 * GIBIBYTE, 20 * GIBIBYTE, 50 * GIBIBYTE, 100 * GIBIBYTE]
+
+
+class UsageModel:
+    """Usage metrics for the entities of a ClusterTopology.
+
+    Capacities, requests and limits are drawn once per entity. Usage follows
+    a smooth daily and weekly cycle per entity, computed from absolute epoch
+    hours, so any range of hours gives the same values.
+
+    All metrics are computed for arrays of (hour, entity) pairs at once and
+    satisfy:
+        usage <= request <= limit <= node capacity
+        sum of the requests of a node's pods <= ALLOCATABLE * node capacity
+        *_seconds == value * INTERVAL_SECONDS
+    """
+
+    def __init__(self, topology, rng):
+        """Initialize the usage model of a cluster topology.
+
+        Args:
+            topology (ClusterTopology) the modelled cluster
+            rng (numpy.random.Generator) random source for entity attributes
+        """
+        nodes = len(topology.nodes)
+        sizes = np.array(NODE_SIZES)[rng.integers(0, len(NODE_SIZES), nodes)]
+        self.node_cpu_cores = sizes[:, 0].astype(np.int64)
+        self.node_memory_bytes = sizes[:, 1].astype(np.int64)
+
+        pods = len(topology.pods)
+        self.pod_node = np.array([pod.node.index for pod in topology.pods], dtype=np.int64)
+        cpu_capacity = self.node_cpu_cores[self.pod_node]
+        memory_capacity = self.node_memory_bytes[self.pod_node]
+        self.pod_cpu_limit = np.round(cpu_capacity * rng.uniform(0.05, 0.5, pods), 3)
+        cpu_request = self.pod_cpu_limit * rng.uniform(0.5, 1.0, pods)
+        # cores have 3 decimal places; rounding down keeps scaled requests within capacity
+        self.pod_cpu_request = np.floor(self._fit(cpu_request, self.node_cpu_cores) * 1000) / 1000
+        self.pod_memory_limit = (memory_capacity * rng.uniform(0.05, 0.5, pods)).astype(np.int64)
+        memory_request = self.pod_memory_limit * rng.uniform(0.5, 1.0, pods)
+        self.pod_memory_request = self._fit(memory_request, self.node_memory_bytes).astype(np.int64)
+        self.pod_cycle = self._cycle(rng, pods)
+
+        volumes = len(topology.volumes)
+        self.volume_capacity = np.array(VOLUME_SIZES, dtype=np.int64)[rng.integers(0, len(VOLUME_SIZES), volumes)]
+        self.volume_request = (self.volume_capacity * rng.uniform(0.5, 1.0, volumes)).astype(np.int64)
+        self.volume_cycle = self._cycle(rng, volumes)
+
+        # column name -> (row kind, metric function)
+        self.columns = {
+            'pod_usage_cpu_core_seconds': ('pod', self._pod_usage_cpu_core_seconds),
+            'pod_request_cpu_core_seconds': ('pod', self._pod_request_cpu_core_seconds),
+            'pod_limit_cpu_core_seconds': ('pod', self._pod_limit_cpu_core_seconds),
+            'pod_usage_memory_byte_seconds': ('pod', self._pod_usage_memory_byte_seconds),
+            'pod_request_memory_byte_seconds': ('pod', self._pod_request_memory_byte_seconds),
+            'pod_limit_memory_byte_seconds': ('pod', self._pod_limit_memory_byte_seconds),
+            'node_capacity_cpu_cores': ('pod', self._node_capacity_cpu_cores),
+            'node_capacity_cpu_core_seconds': ('pod', self._node_capacity_cpu_core_seconds),
+            'node_capacity_memory_bytes': ('pod', self._node_capacity_memory_bytes),
+            'node_capacity_memory_byte_seconds': ('pod', self._node_capacity_memory_byte_seconds),
+            'persistentvolumeclaim_capacity_bytes': ('volume', self._volume_capacity_bytes),
+            'persistentvolumeclaim_capacity_byte_seconds': ('volume', self._volume_capacity_byte_seconds),
+            'volume_request_storage_byte_seconds': ('volume', self._volume_request_storage_byte_seconds),
+            'persistentvolumeclaim_usage_byte_seconds': ('volume', self._volume_usage_byte_seconds),
+        }
+
+    def _fit(self, requests, capacity):
+        """Scale down the requests of the pods of each node to fit in its allocatable capacity.
+
+        Args:
+            requests (numpy.ndarray) requests of each pod
+            capacity (numpy.ndarray) capacity of each node
+        """
+        totals = np.bincount(self.pod_node, weights=requests, minlength=len(capacity))
+        allocatable = capacity * ALLOCATABLE
+        scale = np.minimum(1.0, allocatable / np.maximum(totals, 1e-9))
+        return requests * scale[self.pod_node]
+
+    @staticmethod
+    def _cycle(rng, count):
+        """Draw per-entity parameters of a smooth utilization cycle."""
+        return {
+            'base': rng.uniform(0.3, 0.7, count),
+            'daily': rng.uniform(0.05, 0.25, count),
+            'weekly': rng.uniform(0.0, 0.1, count),
+            'phase': rng.uniform(0.0, 2 * np.pi, count),
+        }
+
+    @staticmethod
+    def _utilization(cycle, hours, entities):
+        """Return utilization in [0.05, 1.0] for (hour, entity) pairs."""
+        phase = cycle['phase'][entities]
+        daily = np.sin(2 * np.pi * (hours % 24) / 24 + phase)
+        weekly = np.sin(2 * np.pi * (hours % 168) / 168 + phase)
+        value = cycle['base'][entities] + cycle['daily'][entities] * daily + cycle['weekly'][entities] * weekly
+        return np.clip(value, 0.05, 1.0)
+
+    def metric(self, kind, colname):
+        """Return the metric function for a column of a row kind, or None if it is not modelled.
+
+        Metric functions take arrays of epoch hours and entity indexes and
+        return one value per pair.
+        """
+        column_kind, function = self.columns.get(colname, (None, None))
+        if column_kind != kind:
+            return None
+        return function
+
+    def _pod_usage_cpu_cores(self, hours, pods):
+        return np.round(self.pod_cpu_request[pods] * self._utilization(self.pod_cycle, hours, pods), 3)
+
+    @staticmethod
+    def _core_seconds(cores):
+        # cores have 3 decimal places; rounding drops floating point noise
+        return np.round(cores * INTERVAL_SECONDS, 3)
+
+    def _pod_usage_cpu_core_seconds(self, hours, pods):
+        return self._core_seconds(self._pod_usage_cpu_cores(hours, pods))
+
+    def _pod_request_cpu_core_seconds(self, hours, pods):
+        return self._core_seconds(self.pod_cpu_request[pods])
+
+    def _pod_limit_cpu_core_seconds(self, hours, pods):
+        return self._core_seconds(self.pod_cpu_limit[pods])
+
+    def _pod_usage_memory_byte_seconds(self, hours, pods):
+        usage = (self.pod_memory_request[pods] * self._utilization(self.pod_cycle, hours, pods)).astype(np.int64)
+        return usage * INTERVAL_SECONDS
+
+    def _pod_request_memory_byte_seconds(self, hours, pods):
+        return self.pod_memory_request[pods] * INTERVAL_SECONDS
+
+    def _pod_limit_memory_byte_seconds(self, hours, pods):
+        return self.pod_memory_limit[pods] * INTERVAL_SECONDS
+
+    def _node_capacity_cpu_cores(self, hours, pods):
+        return self.node_cpu_cores[self.pod_node[pods]]
+
+    def _node_capacity_cpu_core_seconds(self, hours, pods):
+        return self._node_capacity_cpu_cores(hours, pods) * INTERVAL_SECONDS
+
+    def _node_capacity_memory_bytes(self, hours, pods):
+        return self.node_memory_bytes[self.pod_node[pods]]
+
+    def _node_capacity_memory_byte_seconds(self, hours, pods):
+        return self._node_capacity_memory_bytes(hours, pods) * INTERVAL_SECONDS
+
+    def _volume_capacity_bytes(self, hours, volumes):
+        return self.volume_capacity[volumes]
+
+    def _volume_capacity_byte_seconds(self, hours, volumes):
+        return self.volume_capacity[volumes] * INTERVAL_SECONDS
+
+    def _volume_request_storage_byte_seconds(self, hours, volumes):
+        return self.volume_request[volumes] * INTERVAL_SECONDS
+
+    def _volume_usage_byte_seconds(self, hours, volumes):
+        usage = (self.volume_request[volumes] * self._utilization(self.volume_cycle, hours, volumes)).astype(np.int64)
+        return usage * INTERVAL_SECONDS
@@ -16,18 +16,195 @@
 #
 """Cost and Usage Generator for OpenShift metering reports."""
 
+import numpy as np
+
+from nise.util.fake import FAKE
+from .batch import DictionaryArray, constant
 from .date import ChronoGenerator
+from .metrics import UsageModel
+from .text import IntervalField, escape_all
+from .topology import ClusterTopology
+
 
 class OCPGenerator(ChronoGenerator):
-    """Generator to generate lines compatible with OpenShift metering reports."""
+    """Generator to generate lines compatible with OpenShift metering reports.
+
+    Rows are generated from a ClusterTopology: each interval has one row per
+    node, pod or persistent volume claim, depending on the report columns.
+    """
 
     _period_start = 'report_period_start'
     _period_end = 'report_period_end'
     _usage_start = 'interval_start'
     _usage_end = 'interval_end'
 
-    def gen_calc(self, **kwargs):
-        return "NotImplemented: OCP:Calc"
+    def __init__(self, config, topology=None, metrics=None, **kwargs):
+        """Initialize the OCP generator.
+
+        Args:
+            config (dict) compiled configuration
+            topology (ClusterTopology) cluster model shared with other reports. Default is built from config.
+            metrics (UsageModel) usage metrics for the topology. Default is built from the topology.
+            kwargs (dict) keyword args passed to ChronoGenerator
+        """
+        self.topology = topology or ClusterTopology.from_config(config)
+        if metrics is None:
+            rng = np.random.default_rng(FAKE.stream('metrics').getrandbits(64))
+            metrics = UsageModel(self.topology, rng)
+        self.metrics = metrics
+        self.row_kind = self._row_kind(config)
+        self.entities = self.topology.entities(self.row_kind)
+        super().__init__(config, **kwargs)
+
+    @classmethod
+    def report_set(cls, configs, **kwargs):
+        """Build generators for several reports of one cluster.
+
+        The generators share one topology, usage model and timeline, so
+        entity names and metrics are consistent between the reports.
+
+        Args:
+            configs (list) compiled configurations, covering the same report period
+            kwargs (dict) keyword args passed to each generator, such as the topology and metrics to continue.
+                A "scale" keyword multiplies the size of a new topology, and a "sizes" keyword sets it.
+
+        Returns:
+            (list) one OCPGenerator per configuration
+        """
+        scale = kwargs.pop('scale', 1.0)
+        sizes = kwargs.pop('sizes', None)
+        topology = kwargs.pop('topology', None) or ClusterTopology.from_config(*configs, scale=scale, sizes=sizes)
+        first = cls(configs[0], topology=topology, **kwargs)
+        shared = {'topology': first.topology, 'metrics': first.metrics, 'timeline': first.timeline}
+        return [first] + [cls(config, **{**kwargs, **shared}) for config in configs[1:]]
+
+    @staticmethod
+    def _row_kind(config):
+        """Return the kind of entity each row of a report describes."""
+        names = {col.get('name') for col in config.get('columns')}
+        if 'persistentvolumeclaim' in names:
+            return 'volume'
+        if 'pod' in names:
+            return 'pod'
+        return 'node'
+
+    @property
+    def rows_per_interval(self):
+        """One row per entity per interval."""
+        return len(self.entities)
+
+    def shard_kwargs(self):
+        """Share the cluster topology with shard generators."""
+        return {'topology': self.topology, 'metrics': self.metrics}
+
+    def compile_calc(self, **kwargs):
+        """Compile a calculated column from the usage model, if it models the column.
+
+        Values are computed for every entity of an interval at once, when the
+        interval's first row is generated.
+        """
+        metric = self.metrics.metric(self.row_kind, kwargs.get('name'))
+        if metric is None:
+            return super().compile_calc(**kwargs)
+
+        hours = self.timeline.hours
+        entities = np.arange(len(self.entities))
+        interval = None
+        values = None
+
+        def calc():
+            nonlocal interval, values
+            if interval != self._interval:
+                values = metric(hours[self._interval], entities).tolist()
+                interval = self._interval
+            return values[self._entity]
+
+        return calc
+
+    def compile_batch_calc(self, **kwargs):
+        """Compile a vectorized calculated column from the usage model, if it models the column."""
+        metric = self.metrics.metric(self.row_kind, kwargs.get('name'))
+        if metric is None:
+            return super().compile_batch_calc(**kwargs)
+
+        hours = self.timeline.hours
+        count = len(self.entities)
+
+        def calc(start, size):
+            rows = np.arange(start, start + size)
+            return metric(hours[rows // count], rows % count)
+
+        return calc
+
+    def compile_text_calc(self, **kwargs):
+        """Compile a calculated column into an IntervalField of CSV fields, formatted once per interval."""
+        metric = self.metrics.metric(self.row_kind, kwargs.get('name'))
+        if metric is None:
+            return self._compile_text_value(kwargs)
+
+        hours = self.timeline.hours
+        entities = np.arange(len(self.entities))
+        interval = None
+        values = None
+
+        def rows():
+            nonlocal interval, values
+            if interval != self._interval:
+                values = list(map(str, metric(hours[self._interval], entities).tolist()))
+                interval = self._interval
+            return values
+
+        return IntervalField(lambda: rows()[self._entity], rows)
+
+    def compile_string(self, **kwargs):
+        """Compile a string column from the cluster topology, if it models the column."""
+        values = self.topology.values(self.row_kind, kwargs.get('name'))
+        if values is None:
+            return super().compile_string(**kwargs)
+        return lambda: values[self._entity]
+
+    def compile_batch_string(self, **kwargs):
+        """Compile a vectorized string column from the cluster topology, if it models the column."""
+        values = self.topology.values(self.row_kind, kwargs.get('name'))
+        if values is None:
+            return super().compile_batch_string(**kwargs)
+        dictionary = np.array(values, dtype=object)
+        return lambda start, size: DictionaryArray(np.arange(start, start + size) % len(dictionary), dictionary)
+
+    def compile_text_string(self, **kwargs):
+        """Compile a string column from the cluster topology into escaped CSV fields, if it models the column."""
+        values = self.topology.values(self.row_kind, kwargs.get('name'))
+        if values is None:
+            return self._compile_text_value(kwargs)
+        texts = escape_all(values)
+        return IntervalField(lambda: texts[self._entity], lambda: texts)
+
+    def compile_tag(self, **kwargs):
+        """Compile a tag column from the label sets assigned to each entity."""
+        labels = self.topology.labels(self.row_kind, kwargs)
+        if labels is None:
+            return self._compile_default(**kwargs)
+        codes, label_sets = labels
+        values = [label_sets.label_sets[code] for code in codes]
+        return lambda: values[self._entity]
+
+    def compile_batch_tag(self, **kwargs):
+        """Compile a vectorized tag column as a dictionary-encoded array of label sets."""
+        labels = self.topology.labels(self.row_kind, kwargs)
+        if labels is None:
+            default = self._return_default(**kwargs)
+            return lambda start, size: constant(default, size)
+        codes, label_sets = labels
+        codes = np.array(codes)
+        dictionary = np.array(label_sets.label_sets, dtype=object)
+        return lambda start, size: DictionaryArray(codes[np.arange(start, start + size) % len(codes)], dictionary)
 
-    def gen_tag(self, **kwargs):
-        return "NotImplemented: OCP:Tag"
+    def compile_text_tag(self, **kwargs):
+        """Compile a tag column into escaped CSV fields of the label sets assigned to each entity."""
+        labels = self.topology.labels(self.row_kind, kwargs)
+        if labels is None:
+            return self._compile_text_value(kwargs)
+        codes, label_sets = labels
+        escaped = escape_all(label_sets.label_sets)
+        texts = [escaped[code] for code in codes]
+        return IntervalField(lambda: texts[self._entity], lambda: texts)
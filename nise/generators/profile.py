@@ -0,0 +1,186 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Per-column profiling of generated rows."""
+
+import json
+import random
+import sys
+import time
+from array import array
+
+# number of call durations sampled per column for percentiles
+SAMPLES = 10000
+
+# percentiles in profile reports
+PERCENTILES = (50, 95, 99)
+
+
+class ColumnStats:
+    """Call statistics of one compiled column."""
+
+    def __init__(self, report, name, method):
+        """Initialize the statistics of a column.
+
+        Args:
+            report (str) file name of the report the column belongs to
+            name (str) column name
+            method (str) name of the generator method that compiled the column
+        """
+        self.report = report
+        self.name = name
+        self.method = method
+        self.calls = 0
+        self.total_ns = 0
+        self.blocks = 0
+        self.samples = array('q')
+        # separate from the fake value streams, so profiling does not change generated data
+        self._random = random.Random(0)
+
+    def add(self, elapsed_ns, blocks):
+        """Record one call.
+
+        Call durations are sampled into a reservoir of SAMPLES durations.
+        """
+        self.calls += 1
+        self.total_ns += elapsed_ns
+        self.blocks += blocks
+        if len(self.samples) < SAMPLES:
+            self.samples.append(elapsed_ns)
+        else:
+            index = self._random.randrange(self.calls)
+            if index < SAMPLES:
+                self.samples[index] = elapsed_ns
+
+    def percentile(self, percent):
+        """Return a percentile of the sampled call durations, in ns."""
+        if not self.samples:
+            return 0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, len(ordered) * percent // 100)]
+
+    def as_dict(self):
+        """Return the statistics as a dict."""
+        stats = {
+            'report': self.report,
+            'column': self.name,
+            'method': self.method,
+            'calls': self.calls,
+            'total_ms': self.total_ns / 1e6,
+            'mean_us': self.total_ns / self.calls / 1e3 if self.calls else 0.0,
+            'blocks_per_call': self.blocks / self.calls if self.calls else 0.0,
+        }
+        for percent in PERCENTILES:
+            stats[f'p{percent}_us'] = self.percentile(percent) / 1e3
+        return stats
+
+
+class ColumnProfiler:
+    """Profiler timing every call of compiled columns.
+
+    Generators wrap the callables of their row and batch plans with
+    instrument() when BaseGenerator.profiler is set. Plans are left as they
+    are otherwise, so profiling costs nothing when it is off.
+
+    Allocations are counted as the change in the number of memory blocks
+    allocated by the interpreter during a call, i.e. the blocks a call
+    leaves allocated, such as the values it returns.
+    """
+
+    def __init__(self):
+        """Initialize the profiler, measuring the allocations of the instrumentation itself."""
+        self._stats = {}
+        # blocks allocated by the instrumentation itself, measured on a no-op column wrapped like any other
+        self._overhead = 0
+        noop = self.instrument(None, None, None, lambda: None)
+        for _ in range(100):
+            noop()
+        calibration = self._stats.pop((None, None, None))
+        self._overhead = calibration.blocks // calibration.calls
+
+    def instrument(self, report, name, method, func):
+        """Wrap a compiled column callable to record its calls.
+
+        Args:
+            report (str) file name of the report the column belongs to
+            name (str) column name
+            method (str) name of the generator method that compiled the column
+            func (callable) the compiled column
+
+        Returns:
+            (callable) func, recording the duration and allocations of each call
+        """
+        key = (report, name, method)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = ColumnStats(report, name, method)
+        return self._wrap(func, stats)
+
+    def _wrap(self, func, stats):
+        counter = time.perf_counter_ns
+        allocated = sys.getallocatedblocks
+        overhead = self._overhead
+
+        def profiled(*args):
+            blocks = allocated()
+            started = counter()
+            value = func(*args)
+            ended = counter()
+            # read the block count before computing the elapsed time: small ints are cached, so whether
+            # it allocates a block varies, while the other ints always allocate one, covered by the overhead
+            leftover = allocated() - blocks - overhead
+            stats.add(ended - started, leftover)
+            return value
+
+        return profiled
+
+    def columns(self):
+        """Return the statistics of each column, slowest first."""
+        return sorted((stats.as_dict() for stats in self._stats.values()), key=lambda s: s['total_ms'], reverse=True)
+
+    def methods(self):
+        """Return the statistics aggregated per generator method, slowest first."""
+        methods = {}
+        for stats in self._stats.values():
+            totals = methods.setdefault(stats.method, {'method': stats.method, 'calls': 0, 'total_ms': 0.0})
+            totals['calls'] += stats.calls
+            totals['total_ms'] += stats.total_ns / 1e6
+        return sorted(methods.values(), key=lambda s: s['total_ms'], reverse=True)
+
+    def report(self):
+        """Return a text report of the column and method statistics."""
+        percentiles = ''.join(f"{f'p{percent} us':>10s}" for percent in PERCENTILES)
+        lines = [
+            f"{'report':36s} {'column':44s} {'method':24s} {'calls':>10s} {'total ms':>10s} {'mean us':>10s}"
+            f'{percentiles} blocks'
+        ]
+        for stats in self.columns():
+            values = ''.join(f"{stats[f'p{percent}_us']:10.2f}" for percent in PERCENTILES)
+            lines.append(
+                f"{stats['report']:36s} {stats['column']:44s} {stats['method']:24s} {stats['calls']:10d} "
+                f"{stats['total_ms']:10.1f} "
+                f"{stats['mean_us']:10.2f}{values} {stats['blocks_per_call']:6.2f}"
+            )
+        lines.append('')
+        lines.append(f"{'method':24s} {'calls':>10s} {'total ms':>10s}")
+        for stats in self.methods():
+            lines.append(f"{stats['method']:24s} {stats['calls']:10d} {stats['total_ms']:10.1f}")
+        return '\n'.join(lines)
+
+    def dump(self, path):
+        """Write the column and method statistics to a JSON file."""
+        with open(path, 'w') as output:
+            json.dump({'columns': self.columns(), 'methods': self.methods()}, output, indent=2)
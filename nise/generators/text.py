@@ -0,0 +1,99 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""CSV line templates compiled from column definitions."""
+
+# CSV dialect of generated lines, matching the csv module's default "excel" dialect
+DELIMITER = ','
+QUOTECHAR = '"'
+LINE_TERMINATOR = '\r\n'
+
+# characters forcing a value to be quoted
+_SPECIAL = (DELIMITER, QUOTECHAR, '\r', '\n')
+
+
+def needs_quoting(text):
+    """Return whether a CSV field must be quoted."""
+    return any(char in text for char in _SPECIAL)
+
+
+def escape(value):
+    """Format one value as a CSV field, quoting it only when needed, like csv.writer."""
+    text = '' if value is None else str(value)
+    if needs_quoting(text):
+        return QUOTECHAR + text.replace(QUOTECHAR, QUOTECHAR * 2) + QUOTECHAR
+    return text
+
+
+def escape_all(values):
+    """Format a pool of values as CSV fields.
+
+    Quoting is decided once for the whole pool: when no value needs it, the
+    values are only converted to strings.
+    """
+    texts = ['' if value is None else str(value) for value in values]
+    if any(needs_quoting(text) for text in texts):
+        return [escape(text) for text in texts]
+    return texts
+
+
+class IntervalField:
+    """A CSV field callable that can also compute the fields of every row of an interval at once.
+
+    Called with no arguments, it returns the escaped field of the current
+    row, like any other field callable. ChronoGenerator.text_lines() calls
+    rows() instead, once per interval.
+    """
+
+    __slots__ = ['row', 'rows']
+
+    def __init__(self, row, rows):
+        """Initialize an interval field.
+
+        Args:
+            row (callable) zero-argument callable returning the escaped field of the current row
+            rows (callable) zero-argument callable returning an iterable of the escaped fields
+                of every row of the current interval
+        """
+        self.row = row
+        self.rows = rows
+
+    def __call__(self):
+        """Return the escaped field of the current row."""
+        return self.row()
+
+
+def compile_template(fields):
+    """Compile CSV fields into a %-style line template.
+
+    Args:
+        fields (list) one entry per column: a str holding a constant, already
+            escaped field, or a zero-argument callable returning an escaped field,
+            such as an IntervalField
+
+    Returns:
+        (tuple) (template, callables): formatting the template with a tuple of
+            the callables' results produces one CSV line
+    """
+    parts = []
+    callables = []
+    for field in fields:
+        if callable(field):
+            parts.append('%s')
+            callables.append(field)
+        else:
+            parts.append(field.replace('%', '%%'))
+    return DELIMITER.join(parts) + LINE_TERMINATOR, callables
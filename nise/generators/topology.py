@@ -0,0 +1,262 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""OpenShift cluster topology model."""
+
+import random
+from operator import attrgetter
+
+from nise.util import LOG
+from nise.util.fake import FAKE
+from .labels import LabelSets
+
+# default number of entities in a cluster
+DEFAULT_SIZES = {'nodes': 4, 'namespaces': 6, 'pods': 40, 'volumes': 12}
+
+
+class Record:
+    """A compact entity record."""
+
+    __slots__ = []
+
+    def __init__(self, **kwargs):
+        """Initialize a record.
+
+        Args:
+            kwargs (dict) attribute values, by slot name. Missing attributes are None.
+        """
+        for name in self.__slots__:
+            setattr(self, name, kwargs.get(name))
+
+    def __repr__(self):
+        """Return the record with its field values."""
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+
+class Node(Record):
+    """A cluster node."""
+
+    __slots__ = ['index', 'name', 'resource_id']
+
+
+class Namespace(Record):
+    """A project namespace."""
+
+    __slots__ = ['index', 'name']
+
+
+class Pod(Record):
+    """A pod, running in a namespace on a node."""
+
+    __slots__ = ['index', 'name', 'namespace', 'node']
+
+
+class Volume(Record):
+    """A persistent volume claim, bound to a persistent volume and mounted by a pod."""
+
+    __slots__ = ['index', 'claim', 'name', 'storageclass', 'pod']
+
+
+class ClusterTopology:
+    """A fixed set of nodes, namespaces, pods and volumes in one cluster.
+
+    Entity names are generated once from the column formats and seeds in
+    the report templates. Reports then emit one row per entity per hour,
+    instead of generating random names for every row.
+
+    Config Definition:
+        Templates may size the cluster with an optional "topology" key:
+
+            topology:
+              nodes: 4
+              namespaces: 6
+              pods: 40
+              volumes: 12
+    """
+
+    # row kind -> column name -> attribute of the row entity
+    COLUMNS = {
+        'node': {'node': 'name', 'resource_id': 'resource_id'},
+        'pod': {'pod': 'name', 'namespace': 'namespace.name', 'node': 'node.name', 'resource_id': 'node.resource_id'},
+        'volume': {
+            'namespace': 'pod.namespace.name',
+            'pod': 'pod.name',
+            'persistentvolumeclaim': 'claim',
+            'persistentvolume': 'name',
+            'storageclass': 'storageclass',
+        },
+    }
+
+    def __init__(self, columns, nodes=None, namespaces=None, pods=None, volumes=None):
+        """Initialize a cluster topology.
+
+        Args:
+            columns (list) column definitions used to generate entity names
+            nodes (int) number of nodes
+            namespaces (int) number of namespaces
+            pods (int) number of pods
+            volumes (int) number of persistent volume claims
+        """
+        # first definition of each column wins, unless a later one has a seed
+        self._columns = {}
+        for col in columns:
+            current = self._columns.get(col.get('name'))
+            if current is None or (col.get('seed') and not current.get('seed')):
+                self._columns[col.get('name')] = col
+        self.random = FAKE.stream('topology')
+        self._label_seed = self.random.getrandbits(64)
+        self._labels = {}
+
+        node_names = self._names('node', nodes or DEFAULT_SIZES['nodes'])
+        resource_ids = self._names('resource_id', len(node_names))
+        self.nodes = [
+            Node(index=idx, name=name, resource_id=resource_id)
+            for idx, (name, resource_id) in enumerate(zip(node_names, resource_ids))
+        ]
+
+        self.namespaces = [
+            Namespace(index=idx, name=name)
+            for idx, name in enumerate(self._names('namespace', namespaces or DEFAULT_SIZES['namespaces']))
+        ]
+
+        # every namespace gets at least one pod; pods are spread evenly across nodes
+        self.pods = [
+            Pod(
+                index=idx,
+                name=name,
+                namespace=self.namespaces[idx % len(self.namespaces)],
+                node=self.nodes[idx % len(self.nodes)],
+            )
+            for idx, name in enumerate(self._names('pod', pods or DEFAULT_SIZES['pods']))
+        ]
+
+        count = volumes or DEFAULT_SIZES['volumes']
+        claims = self._names('persistentvolumeclaim', count)
+        volume_names = self._names('persistentvolume', count)
+        self.volumes = [
+            Volume(
+                index=idx,
+                claim=claim,
+                name=name,
+                storageclass=self._choice('storageclass'),
+                pod=self.random.choice(self.pods),
+            )
+            for idx, (claim, name) in enumerate(zip(claims, volume_names))
+        ]
+        LOG.debug(
+            f'Cluster topology: {len(self.nodes)} nodes, {len(self.namespaces)} namespaces, '
+            f'{len(self.pods)} pods, {len(self.volumes)} volumes'
+        )
+
+    @classmethod
+    def from_config(cls, *configs, scale=1.0, sizes=None):
+        """Build a topology from the columns and sizes of one or more configurations.
+
+        Args:
+            configs (dict) compiled configurations
+            scale (float) multiplier of the configured or default sizes
+            sizes (dict) number of entities of each kind, such as the sizes of a previous topology.
+                Default is the configured sizes, multiplied by scale.
+        """
+        columns = []
+        for config in configs:
+            columns.extend(config.get('columns'))
+        if sizes is not None:
+            return cls(columns, **sizes)
+        sizes = {}
+        for config in configs:
+            for key, value in (config.get('topology') or {}).items():
+                sizes.setdefault(key, value)
+        if scale != 1.0:
+            sizes = {key: max(1, round((sizes.get(key) or default) * scale)) for key, default in DEFAULT_SIZES.items()}
+        return cls(columns, **sizes)
+
+    @property
+    def sizes(self):
+        """Number of entities of each kind, as passed to the constructor."""
+        return {
+            'nodes': len(self.nodes),
+            'namespaces': len(self.namespaces),
+            'pods': len(self.pods),
+            'volumes': len(self.volumes),
+        }
+
+    def entities(self, kind):
+        """Return the entities of a row kind."""
+        return {'node': self.nodes, 'pod': self.pods, 'volume': self.volumes}[kind]
+
+    def values(self, kind, colname):
+        """Return one value per entity of a row kind for a column, or None if the column is not modelled."""
+        attribute = self.COLUMNS[kind].get(colname)
+        if attribute is None:
+            return None
+        getter = attrgetter(attribute)
+        return [getter(entity) for entity in self.entities(kind)]
+
+    def labels(self, kind, column):
+        """Return label sets for a tag column and the label set assigned to each entity of a row kind.
+
+        Assignments are cached, and depend only on the topology, the row kind
+        and the column name, so copies of a topology assign the same labels.
+
+        Args:
+            kind (str) row kind
+            column (dict) a tag column definition
+
+        Returns:
+            (tuple) (list of label set indexes, one per entity, LabelSets), or None if the column has no seed
+        """
+        if not column.get('seed'):
+            return None
+        key = (kind, column.get('name'))
+        if key not in self._labels:
+            label_sets = LabelSets(column, random.Random(f"{self._label_seed}:{kind}:{column.get('name')}"))
+            self._labels[key] = (label_sets.assign(len(self.entities(kind))), label_sets)
+        return self._labels[key]
+
+    def _seed(self, colname):
+        """Return the seed values for a column, or the fake word pool."""
+        return self._columns.get(colname, {}).get('seed') or FAKE.pool('word')
+
+    def _choice(self, colname):
+        """Pick one value for a column from its seed, or its default."""
+        column = self._columns.get(colname, {})
+        if column.get('seed'):
+            return self.random.choice(column.get('seed'))
+        return column.get('default')
+
+    def _names(self, colname, count):
+        """Generate distinct values for a column from its format and seed."""
+        column = self._columns.get(colname, {})
+        colformat = column.get('format') or '{}'
+        fields = colformat.count('{}') or 1
+        values = self._seed(colname)
+
+        names = []
+        seen = set()
+        for _ in range(count * 10):
+            if len(names) == count:
+                break
+            name = colformat.format(*[self.random.choice(values) for _ in range(fields)])
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+
+        # small seeds can run out of distinct combinations
+        for idx in range(len(names), count):
+            names.append(f'{names[idx % len(names)]}-{idx}')
+        return names
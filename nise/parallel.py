@@ -0,0 +1,114 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Parallel generation helpers."""
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from nise.generators.date import BLOCK_HOURS
+from nise.util import DateHelper, LOG
+from nise.util.fake import seed_all
+from nise.writers import CSVWriter
+
+# shards are whole multiples of this many hourly intervals
+SHARD_HOURS = BLOCK_HOURS
+
+
+def split_intervals(start, end, shards, origin=None):
+    """Split a date range into contiguous ranges of whole hours.
+
+    Ranges are aligned to SHARD_HOURS intervals after `origin`, so the same
+    boundaries are used no matter how many shards are requested.
+
+    Args:
+        start (datetime) start of the first usage interval
+        end (datetime) latest end of the last usage interval
+        shards (int) maximum number of ranges
+        origin (datetime) datetime the ranges are aligned to. Default is start.
+
+    Returns:
+        (list) a list of (interval_start, interval_end) tuples
+    """
+    one_hour = DateHelper().one_hour
+    # hours before start in the first block
+    skew = int((start - (origin or start)) / one_hour) % SHARD_HOURS
+    hours = int((end - start) / one_hour)
+    blocks = -(-(hours + skew) // SHARD_HOURS)
+    step = max(1, -(-blocks // shards)) * SHARD_HOURS
+
+    ranges = []
+    for offset in range(-skew, hours, step):
+        ranges.append((start + max(offset, 0) * one_hour, start + min(offset + step, hours) * one_hour))
+    return ranges or [(start, end)]
+
+
+def _generate_shard(generator_class, config, kwargs, seed, interval, path):
+    """Write the rows of one interval range to a header-less CSV file."""
+    # unseeded, restart from fresh entropy: forked workers inherit the parent's random state
+    seed_all(seed)
+    interval_start, interval_end = interval
+    generator = generator_class(config, interval_start=interval_start, interval_end=interval_end, **kwargs)
+    with CSVWriter(path, None) as writer:
+        writer.write_lines(generator.text_lines())
+    return writer.rows
+
+
+def generate_sharded(generator, path, workers, seed=None, writer_class=CSVWriter, **writer_kwargs):
+    """Generate a report file using a pool of worker processes.
+
+    The generator's interval range is split into contiguous shards, each
+    generated by its own ChronoGenerator in a separate process. Shards are
+    appended to the output file in chronological order as they complete.
+    With a seed, the output is identical to a serial run using the same seed.
+
+    Args:
+        generator (ChronoGenerator) generator covering the whole interval range
+        path (str) path of the file to write
+        workers (int) number of worker processes
+        seed (int) seed for the fake value provider, or None
+        writer_class (class) writer of the output file: CSVWriter, or another writer implementing append_file()
+        writer_kwargs (dict) keyword args of the writer, such as upload
+
+    Returns:
+        (BaseWriter) the writer used for the output file
+    """
+    shards = split_intervals(generator.interval_start, generator.interval_end, workers, origin=generator.start_date)
+    LOG.debug(f'Generating {path} in {len(shards)} shards: {shards}')
+
+    tmpdir = tempfile.mkdtemp(prefix='.nise-', dir=os.path.dirname(path) or '.')
+    parts = [os.path.join(tmpdir, f'part-{idx:05d}.csv') for idx in range(len(shards))]
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                _generate_shard,
+                repeat(type(generator)),
+                repeat(generator.config),
+                repeat(generator.shard_kwargs()),
+                repeat(seed),
+                shards,
+                parts,
+            )
+            with writer_class(path, generator.header, **writer_kwargs) as writer:
+                for part, rows in zip(parts, results):
+                    writer.append_file(part, rows)
+                    os.remove(part)
+    finally:
+        shutil.rmtree(tmpdir)
+    return writer
@@ -0,0 +1,229 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Chunked upload of report files to an ingress endpoint."""
+
+import os
+import queue
+import threading
+import time
+
+from nise.exceptions import NiseError
+from nise.util import LOG
+
+MEGABYTE = 1024 * 1024
+
+# size of each uploaded chunk, in bytes
+CHUNK_SIZE = 8 * MEGABYTE
+
+# number of attempts to send a chunk before giving up on it
+ATTEMPTS = 4
+
+# delay before the first retry, in seconds; doubled for each further retry
+BACKOFF = 0.5
+
+# HTTP status codes worth retrying
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class UploadPipeline:
+    """Upload report files in chunks while they are being generated.
+
+    Writers hand over their output with write() as they flush it, and call
+    finish() once the file is complete. Data is cut into chunks of
+    `chunk_size` bytes and put on a bounded queue, which `concurrency` worker
+    threads drain through one keep-alive HTTP session. When the workers fall
+    behind, write() blocks, so memory use stays bounded.
+
+    Each chunk is POSTed to the endpoint with these headers:
+        X-Nise-Filename: base name of the report file
+        X-Nise-Chunk: 0-based index of the chunk in the file
+        Content-Range: bytes FIRST-LAST/TOTAL, where TOTAL is * until the last chunk
+
+    Example:
+        with UploadPipeline(endpoint) as upload:
+            with CSVWriter(path, generator.header, upload=upload) as writer:
+                writer.write_rows(generator.lines())
+        LOG.info(upload.summary())
+    """
+
+    def __init__(self, endpoint, concurrency=4, chunk_size=CHUNK_SIZE, attempts=ATTEMPTS, backoff=BACKOFF):
+        """Initialize the pipeline.
+
+        Args:
+            endpoint (str) URL the chunks are POSTed to
+            concurrency (int) number of concurrent uploads
+            chunk_size (int) size of each chunk, in bytes
+            attempts (int) number of attempts to send a chunk
+            backoff (float) delay before the first retry, in seconds
+        """
+        self.endpoint = endpoint
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.attempts = attempts
+        self.backoff = backoff
+
+        # upload statistics
+        self.files = 0
+        self.chunks = 0
+        self.bytes = 0
+        self.retries = 0
+        self.failures = 0
+        self.elapsed = 0.0
+
+        self._queue = queue.Queue(maxsize=2 * concurrency)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._session = None
+        self._started = None
+
+    def __enter__(self):
+        """Start the upload workers."""
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Wait for the uploads to finish, raising NiseError if chunks failed to upload."""
+        self.close()
+        if exc_type is None and self.failures:
+            raise NiseError(f'{self.failures} chunks failed to upload to {self.endpoint}.')
+
+    def start(self):
+        """Open the HTTP session and start the upload threads."""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._started = time.perf_counter()
+        for _ in range(self.concurrency):
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def close(self):
+        """Wait for queued chunks to be sent, then stop the upload threads."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        if self._started is not None:
+            self.elapsed = time.perf_counter() - self._started
+
+    def write(self, path, data):
+        """Append data to the upload of a file, queueing every complete chunk.
+
+        Args:
+            path (str) path of the report file
+            data (bytes) data following the data previously written for the file
+        """
+        offset, buffer, index = self._pending.get(path) or (0, bytearray(), 0)
+        buffer += data
+        while len(buffer) >= self.chunk_size:
+            chunk = bytes(buffer[: self.chunk_size])
+            del buffer[: self.chunk_size]
+            self._queue.put((path, index, offset, chunk, None))
+            offset += len(chunk)
+            index += 1
+        self._pending[path] = (offset, buffer, index)
+
+    def finish(self, path):
+        """Queue the last chunk of a file written with write()."""
+        offset, buffer, index = self._pending.pop(path, None) or (0, bytearray(), 0)
+        self._queue.put((path, index, offset, bytes(buffer), offset + len(buffer)))
+        with self._lock:
+            self.files += 1
+
+    def send_file(self, path):
+        """Queue every chunk of a complete file."""
+        with open(path, 'rb') as report:
+            for data in iter(lambda: report.read(self.chunk_size), b''):
+                self.write(path, data)
+        self.finish(path)
+
+    def _work(self):
+        """Send queued chunks until stopped.
+
+        An unexpected error fails only the chunk being sent: the thread keeps
+        draining the queue, so writers and close() never wait on a dead thread.
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self._send(*item)
+            except Exception as exc:  # pylint: disable=broad-except
+                LOG.error(f'Upload of chunk {item[1]} of {item[0]} failed: {exc!r}')
+                with self._lock:
+                    self.failures += 1
+
+    def _send(self, path, index, offset, data, total):
+        """POST one chunk, retrying connection errors and transient HTTP errors."""
+        import requests
+
+        if data:
+            content_range = f"bytes {offset}-{offset + len(data) - 1}/{'*' if total is None else total}"
+        else:
+            # the file ended on a chunk boundary
+            content_range = f'bytes */{total}'
+        headers = {
+            'Content-Type': 'application/octet-stream',
+            'Content-Range': content_range,
+            'X-Nise-Filename': os.path.basename(path),
+            'X-Nise-Chunk': str(index),
+        }
+        for attempt in range(self.attempts):
+            if attempt:
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                response = self._session.post(self.endpoint, data=data, headers=headers)
+            except requests.RequestException as exc:
+                LOG.debug(f'Upload of chunk {index} of {path} failed: {exc}')
+                continue
+            if response.status_code in RETRY_STATUS:
+                LOG.debug(f'Upload of chunk {index} of {path} failed: HTTP {response.status_code}')
+                continue
+            if response.ok:
+                with self._lock:
+                    self.chunks += 1
+                    self.bytes += len(data)
+                return
+            LOG.error(f'Upload of chunk {index} of {path} was rejected: HTTP {response.status_code}')
+            break
+        else:
+            LOG.error(f'Upload of chunk {index} of {path} failed after {self.attempts} attempts.')
+        with self._lock:
+            self.failures += 1
+
+    def summary(self):
+        """Return a throughput and retry summary of the upload."""
+        elapsed = self.elapsed or float('inf')
+        megabytes = self.bytes / MEGABYTE
+        return (
+            f'Uploaded {self.files} files to {self.endpoint}: {megabytes:.2f} MiB in {self.chunks} chunks '
+            f'in {self.elapsed:.2f}s ({megabytes / elapsed:.2f} MiB/sec), '
+            f'{self.retries} retries, {self.failures} failures'
+        )
@@ -16,6 +16,7 @@
 #
 """Date utilities."""
 
+import calendar
 from datetime import datetime, timedelta
 
 import pytz
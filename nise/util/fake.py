@@ -0,0 +1,168 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Pooled, seeded fake value provider."""
+
+import hashlib
+import random
+from copy import copy
+
+import numpy as np
+
+# number of values sampled from Faker for each pooled provider
+POOL_SIZE = 1024
+
+# providers served from pools when called without arguments
+POOLED_PROVIDERS = {'word'}
+
+
+class FakePool:
+    """Fake values sampled from Faker once, then drawn with a fast RNG.
+
+    Each pool holds POOL_SIZE values sampled from one Faker provider. Values
+    are drawn from pools with random.Random (single values) or a NumPy
+    Generator (batched draws), both of which are seeded by seed().
+
+    When seeded, pool contents depend only on the seed and the provider,
+    and reseed() restarts the random streams at a numbered block, so
+    independently generated blocks of rows are reproducible. Consumers that
+    reseed their streams, such as report generators, use a fork() of the
+    shared pool, so that they do not restart each other's streams.
+
+    Faker is imported when the first value is sampled from it.
+    """
+
+    def __init__(self, seed=None):
+        """Initialize the pool.
+
+        Args:
+            seed (int) seed for pools and random streams, or None for unseeded
+        """
+        self._faker = None
+        self.random = random.Random()
+        self.rng = np.random.default_rng()
+        self._methods = {}
+        self._pools = {}
+        self._arrays = {}
+        self._seed = None
+        self.name = None
+        # pool owning the Faker instance, shared with forks
+        self._root = self
+        self.seed(seed)
+
+    @property
+    def faker(self):
+        """The Faker instance used to sample values."""
+        root = self._root
+        if root._faker is None:
+            from faker import Faker
+
+            root._faker = Faker()
+        return root._faker
+
+    @property
+    def seeded(self):
+        """Whether this pool was seeded."""
+        return self._seed is not None
+
+    def seed(self, seed):
+        """Seed the random streams and discard sampled pools.
+
+        Seeding with None restarts the streams from fresh entropy, so forked
+        processes do not repeat each other's values.
+        """
+        self._seed = seed
+        self._pools = {}
+        self._arrays = {}
+        if seed is None:
+            self.random.seed()
+            self.rng = np.random.default_rng()
+            if self._faker is not None:
+                self._faker.seed_instance()
+        self.reseed(0)
+
+    def reseed(self, block):
+        """Restart the random streams at a numbered block. Does nothing when unseeded."""
+        if self._seed is None:
+            return
+        if self.name is None:
+            self.random.seed(f'{self._seed}:{block}')
+            self.rng = np.random.default_rng([self._seed, block])
+        else:
+            self.random.seed(f'{self._seed}:{self.name}:{block}')
+            name_key = int.from_bytes(hashlib.sha256(self.name.encode()).digest()[:8], 'big')
+            self.rng = np.random.default_rng([self._seed, block, name_key])
+
+    def fork(self, name):
+        """Return a pool with random streams of its own, sharing this pool's sampled values.
+
+        When seeded, the streams of the fork depend only on the seed, the name
+        and the block passed to reseed(). Reseeding the fork does not affect
+        this pool or its other forks.
+
+        Args:
+            name (str) name of the fork's streams, such as a report file name
+        """
+        fork = copy(self)
+        fork.name = name
+        fork.random = random.Random()
+        fork.rng = np.random.default_rng()
+        fork.reseed(0)
+        return fork
+
+    def stream(self, name):
+        """Return a random.Random for a named purpose, independent of the shared streams.
+
+        When seeded, the returned stream depends only on the seed and the name.
+        """
+        return random.Random(f'{self._seed}:{name}' if self._seed is not None else None)
+
+    def call(self, provider, **kwargs):
+        """Call a Faker provider."""
+        method = self._methods.get(provider)
+        if method is None:
+            method = self._methods[provider] = getattr(self.faker, provider)
+        return method(**kwargs)
+
+    def pool(self, provider):
+        """Return the pool of values sampled from a Faker provider."""
+        values = self._pools.get(provider)
+        if values is None:
+            if self._seed is not None:
+                self.faker.seed_instance(f'{self._seed}:{provider}')
+            method = self._methods.get(provider) or getattr(self.faker, provider)
+            values = self._pools[provider] = [method() for _ in range(POOL_SIZE)]
+        return values
+
+    def draw(self, provider):
+        """Draw one value from a provider's pool."""
+        return self.random.choice(self.pool(provider))
+
+    def draws(self, provider, count):
+        """Draw an array of values from a provider's pool."""
+        values = self._arrays.get(provider)
+        if values is None:
+            values = self._arrays[provider] = np.array(self.pool(provider), dtype=object)
+        return values[self.rng.integers(0, len(values), count)]
+
+
+FAKE = FakePool()
+
+
+def seed_all(seed):
+    """Seed the shared fake value provider and the random module."""
+    random.seed(seed)
+    FAKE.seed(seed)
@@ -16,13 +16,8 @@
 #
 """Jinja2 Faker extension."""
 
-import random
-
-from faker import Faker
-
-from util.log import LOG
-
-FAKE = Faker()
+from nise.util.fake import FAKE, POOLED_PROVIDERS
+from nise.util.log import LOG
 
 
 def faker_passthrough(provider, **kwargs):
@@ -35,6 +30,9 @@ def faker_passthrough(provider, **kwargs):
     The first argument MUST be the faker provider being called.
 
     All keyword arguments are passed through to the Faker object using the named provider.
+    Providers in POOLED_PROVIDERS called without keyword arguments draw from a pool of values.
 
     """
-    return getattr(FAKE, provider)(**kwargs)
+    if not kwargs and provider in POOLED_PROVIDERS:
+        return FAKE.draw(provider)
+    return FAKE.call(provider, **kwargs)
@@ -24,3 +24,10 @@ LOG = logging.getLogger(__name__)
 LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
 LOG_VERBOSITY = [logging.ERROR, logging.WARNING, logging.INFO, logging.DEBUG]
 logging.basicConfig(format=LOG_FORMAT, level=logging.ERROR, stream=sys.stdout)
+
+
+def log_to_stderr():
+    """Send log records to stderr instead of stdout."""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.StreamHandler):
+            handler.setStream(sys.stderr)
@@ -0,0 +1,26 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Registry of writer classes."""
+
+from .columnar import ArrowWriter, ParquetWriter
+from .compress import CODECS
+from .csv_file import CSVWriter
+from .rollover import RolloverWriter
+from .stream import StreamWriter
+
+# writer class for each output format
+WRITERS = {'csv': CSVWriter, 'parquet': ParquetWriter, 'arrow': ArrowWriter}
@@ -0,0 +1,111 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Base Writer."""
+
+import os
+import time
+
+MEGABYTE = 1024 * 1024
+
+
+class BaseWriter:
+    """Writer object to write generated data to a report file.
+
+    Sub-classes should implement open(), write_rows() and close(). Writers
+    are context managers; the file is opened on entry and closed on exit.
+
+    Example:
+        with SomeWriter(path, generator.header) as writer:
+            writer.write_rows(generator.lines())
+        LOG.info(writer.summary())
+    """
+
+    def __init__(self, path, header, upload=None):
+        """Initialize the writer.
+
+        Args:
+            path (str) path of the file to write
+            header (list) column names
+            upload (UploadPipeline) pipeline uploading the file, or None
+        """
+        self.path = path
+        self.header = header
+        self.upload = upload
+        self.rows = 0
+        self.bytes = 0
+        self.elapsed = 0.0
+        self._started = None
+
+    def __enter__(self):
+        """Open the file."""
+        self._started = time.perf_counter()
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the file, and finish its upload."""
+        self.close()
+        self.elapsed = time.perf_counter() - self._started
+        self.bytes = self.size()
+        if exc_type is None and self.upload is not None:
+            self.finish_upload()
+
+    def open(self):
+        """Open the output file."""
+        raise NotImplementedError
+
+    def close(self):
+        """Flush and close the output file."""
+        raise NotImplementedError
+
+    def size(self):
+        """Return the size of the written output, in bytes."""
+        return os.path.getsize(self.path)
+
+    def finish_upload(self):
+        """Hand the written file over to the upload pipeline.
+
+        Sub-classes that stream their output to the pipeline while writing
+        should override this to finish the upload instead.
+        """
+        self.upload.send_file(self.path)
+
+    def write_rows(self, rows):
+        """Write an iterable of rows."""
+        raise NotImplementedError
+
+    def write_batch(self, batch):
+        """Write a column-oriented batch of rows."""
+        self.write_rows(batch.rows())
+
+    def write_batches(self, batches):
+        """Write an iterable of batches."""
+        for batch in batches:
+            self.write_batch(batch)
+
+    def summary(self):
+        """Return a throughput summary for the written file.
+
+        Sizes are reported in MiB and rates are per wall-clock second between
+        opening and closing the writer, so numbers are comparable across runs.
+        """
+        elapsed = self.elapsed or float('inf')
+        megabytes = self.bytes / MEGABYTE
+        return (
+            f'Wrote {self.path}: {self.rows} rows, {megabytes:.2f} MiB in {self.elapsed:.2f}s '
+            f'({self.rows / elapsed:.0f} rows/sec, {megabytes / elapsed:.2f} MiB/sec)'
+        )
@@ -0,0 +1,164 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Columnar Writers for Parquet and Arrow IPC files.
+
+pyarrow is an optional dependency. It is imported when a writer is opened,
+so that CSV output does not require it.
+"""
+
+import numpy as np
+
+from nise.exceptions import NiseError
+from nise.generators.batch import DictionaryArray, TimestampArray
+from .base import BaseWriter
+
+
+def import_pyarrow():
+    """Import pyarrow, raising NiseError if it is not installed."""
+    try:
+        import pyarrow
+    except ImportError:
+        raise NiseError('Columnar output formats require pyarrow. Install it with: pip install pyarrow')
+    return pyarrow
+
+
+def arrow_type(pa, coltype, column):
+    """Return the Arrow type of a batch column.
+
+    Args:
+        pa (module) pyarrow
+        coltype (str) column type from the generator configuration
+        column (obj) numpy.ndarray, DictionaryArray or TimestampArray
+
+    Returns:
+        (pyarrow.DataType) the column's type
+    """
+    if coltype == 'datetime' and isinstance(column, TimestampArray):
+        return pa.timestamp('s', tz='UTC')
+    if isinstance(column, DictionaryArray):
+        return pa.dictionary(pa.int32(), pa.string())
+    if coltype == 'calc' and column.dtype != object:
+        return pa.from_numpy_dtype(column.dtype)
+    return pa.string()
+
+
+def arrow_array(pa, column, datatype):
+    """Convert a batch column to an Arrow array of the given type."""
+    if isinstance(column, DictionaryArray):
+        if pa.types.is_dictionary(datatype):
+            return pa.DictionaryArray.from_arrays(
+                column.codes.astype(np.int32), pa.array(column.dictionary, type=pa.string())
+            )
+        return pa.array(column.decode(), type=datatype)
+    if isinstance(column, TimestampArray):
+        if pa.types.is_timestamp(datatype):
+            return pa.array(column.values, type=datatype)
+        return pa.array(column.decode(), type=datatype)
+    return pa.array(column, type=datatype)
+
+
+class ColumnarWriter(BaseWriter):
+    """Writer to store column-oriented batches in a columnar file.
+
+    The schema is built from the header, the configured column types and the
+    columns of the first batch: dictionary-encoded columns are written as
+    Arrow dictionaries, timestamp columns as UTC timestamps and numeric calc
+    columns with their numpy type. Other columns are written as strings.
+
+    Columnar writers only accept batches; write_rows() is not supported.
+
+    Sub-classes should implement _open_file(schema) and _write_table(table).
+    """
+
+    # file name extension of the output format
+    extension = None
+
+    def __init__(self, path, header, types=None, upload=None):
+        """Initialize the writer.
+
+        Args:
+            path (str) path of the file to write
+            header (list) column names
+            types (list) configured column types, one per column name
+            upload (UploadPipeline) pipeline uploading the file once it is closed, or None
+        """
+        super().__init__(path, header, upload=upload)
+        self.types = types or [None] * len(header)
+        self.schema = None
+        self._pa = None
+        self._file = None
+
+    def open(self):
+        """Import pyarrow. The file is created with the first batch, once the schema is known."""
+        self._pa = import_pyarrow()
+
+    def close(self):
+        """Close the output file. An empty file with a string schema is written if no batch was."""
+        if self._file is None:
+            self._open_file(self._pa.schema([(name, self._pa.string()) for name in self.header]))
+        self._file.close()
+
+    def write_rows(self, rows):
+        """Not supported. Use write_batch() or write_batches()."""
+        raise NiseError(f'{type(self).__name__} only writes batches.')
+
+    def write_batch(self, batch):
+        """Write a batch of rows."""
+        pa = self._pa
+        if self.schema is None:
+            self.schema = pa.schema(
+                [
+                    (name, arrow_type(pa, coltype, column))
+                    for name, coltype, column in zip(self.header, self.types, batch.columns)
+                ]
+            )
+            self._open_file(self.schema)
+        arrays = [arrow_array(pa, column, field.type) for column, field in zip(batch.columns, self.schema)]
+        self._write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        self.rows += len(batch)
+
+    def _open_file(self, schema):
+        raise NotImplementedError
+
+    def _write_table(self, table):
+        raise NotImplementedError
+
+
+class ParquetWriter(ColumnarWriter):
+    """Writer to store batches in a Parquet file, one row group per batch."""
+
+    extension = '.parquet'
+
+    def _open_file(self, schema):
+        import pyarrow.parquet
+
+        self._file = pyarrow.parquet.ParquetWriter(self.path, schema)
+
+    def _write_table(self, table):
+        self._file.write_table(table, row_group_size=table.num_rows)
+
+
+class ArrowWriter(ColumnarWriter):
+    """Writer to store batches in an Arrow IPC file, one record batch per batch."""
+
+    extension = '.arrow'
+
+    def _open_file(self, schema):
+        self._file = self._pa.ipc.new_file(self.path, schema)
+
+    def _write_table(self, table):
+        self._file.write_table(table)
@@ -0,0 +1,159 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Block-parallel gzip and zstd compression of output files.
+
+Output is cut into independent blocks, compressed on a thread pool and
+written in order, as concatenated gzip members or zstd frames. Both formats
+decompress as one stream with standard tools. zlib and zstd release the GIL
+while compressing, so compression overlaps with row generation.
+
+zstd support requires the optional zstandard package, imported when used.
+"""
+
+import os
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from nise.exceptions import NiseError
+
+# size of the uncompressed blocks compressed independently, in bytes
+BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class GzipCodec:
+    """Compress blocks into gzip members."""
+
+    suffix = '.gz'
+
+    def __init__(self, level=6):
+        """Initialize the codec.
+
+        Args:
+            level (int) zlib compression level, from 1 to 9
+        """
+        self.level = level
+
+    def compress(self, data):
+        """Return data compressed as one gzip member."""
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+
+class ZstdCodec:
+    """Compress blocks into zstd frames."""
+
+    suffix = '.zst'
+
+    def __init__(self, level=3):
+        """Initialize the codec.
+
+        Args:
+            level (int) zstd compression level
+        """
+        try:
+            import zstandard
+        except ImportError:
+            raise NiseError('zstd compression requires zstandard. Install it with: pip install zstandard')
+        self.level = level
+        self._zstandard = zstandard
+        # compressors are not thread-safe: each thread gets its own
+        self._local = threading.local()
+
+    def compress(self, data):
+        """Return data compressed as one zstd frame."""
+        compressor = getattr(self._local, 'compressor', None)
+        if compressor is None:
+            compressor = self._local.compressor = self._zstandard.ZstdCompressor(level=self.level)
+        return compressor.compress(data)
+
+
+# codec class for each --compress choice
+CODECS = {'gzip': GzipCodec, 'zstd': ZstdCodec}
+
+
+class BlockCompressedFile:
+    """A writable text file compressed block by block on a thread pool.
+
+    Text is encoded as UTF-8 and collected into blocks of `block_size` bytes.
+    Each full block is compressed by a worker thread; compressed blocks are
+    written in order as they complete. At most two blocks per thread are
+    pending, so memory use is bounded.
+    """
+
+    def __init__(self, path, codec, mode='w', threads=None, block_size=BLOCK_SIZE, sink=None):
+        """Initialize the file.
+
+        Args:
+            path (str) path of the compressed file
+            codec (GzipCodec or ZstdCodec) block codec
+            mode (str) "w" to truncate the file or "a" to append to it
+            threads (int) number of compression threads. Default is the number of CPUs.
+            block_size (int) size of the uncompressed blocks, in bytes
+            sink (callable) called with each compressed block after it is written, or None
+        """
+        self.codec = codec
+        self.block_size = block_size
+        self.sink = sink
+        self.threads = threads or os.cpu_count() or 1
+        self._raw = open(path, mode + 'b')
+        self._executor = ThreadPoolExecutor(max_workers=self.threads)
+        self._pending = deque()
+        self._block = []
+        self._size = 0
+
+    def tell(self):
+        """Return the position in the compressed file, as of the last written block."""
+        return self._raw.tell()
+
+    def write(self, text):
+        """Write a string."""
+        data = text.encode('utf-8')
+        self._block.append(data)
+        self._size += len(data)
+        if self._size >= self.block_size:
+            self._submit()
+
+    def writelines(self, lines):
+        """Write an iterable of strings."""
+        self.write(''.join(lines))
+
+    def close(self):
+        """Compress and write the last block, then close the file."""
+        try:
+            if self._block:
+                self._submit()
+            while self._pending:
+                self._write_block()
+        finally:
+            self._executor.shutdown()
+            self._raw.close()
+
+    def _submit(self):
+        """Hand the current block over to the compression threads."""
+        self._pending.append(self._executor.submit(self.codec.compress, b''.join(self._block)))
+        self._block = []
+        self._size = 0
+        while self._pending and (self._pending[0].done() or len(self._pending) > 2 * self.threads):
+            self._write_block()
+
+    def _write_block(self):
+        data = self._pending.popleft().result()
+        self._raw.write(data)
+        if self.sink is not None:
+            self.sink(data)
@@ -0,0 +1,148 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Streaming CSV Writer."""
+
+import csv
+import functools
+from itertools import islice
+
+from .base import BaseWriter
+from .compress import BlockCompressedFile
+
+# number of rows held in the buffer between writes
+BUFFER_ROWS = 8192
+
+# size of the underlying file buffer, in bytes
+FILE_BUFFER = 1024 * 1024
+
+
+class _LineBuffer(list):
+    """A reusable list of CSV-formatted lines."""
+
+    write = list.append
+
+
+class CSVWriter(BaseWriter):
+    """Writer to stream rows into a CSV file.
+
+    Rows are formatted into a reusable in-memory buffer of at most
+    `buffer_rows` lines, which is written to disk with one writelines() call
+    whenever it fills. Memory use does not depend on the size of the output.
+    With an upload pipeline, each write is also handed to the pipeline, so the
+    file is uploaded while it is generated. Appended files are sent whole
+    once they are closed instead, so the upload holds the earlier rows too.
+    With a compression codec, the file is compressed block by block on a
+    thread pool as it is written.
+    """
+
+    extension = '.csv'
+
+    def __init__(self, path, header, buffer_rows=BUFFER_ROWS, upload=None, append=False, compression=None):
+        """Initialize the writer.
+
+        Args:
+            path (str) path of the file to write
+            header (list) column names, or None to omit the header
+            buffer_rows (int) number of rows buffered between writes
+            upload (UploadPipeline) pipeline the file is streamed to as it is written, or None.
+                In append mode, the whole file is sent to it when the writer is closed.
+            append (bool) append to the file if it exists. The header is only written to an empty file.
+            compression (GzipCodec or ZstdCodec) codec compressing the file block by block, or None
+        """
+        super().__init__(path, header, upload=upload)
+        self.buffer_rows = buffer_rows
+        self.append = append
+        self.compression = compression
+        self._buffer = _LineBuffer()
+        self._csv = csv.writer(self._buffer)
+        self._file = None
+        # appended files are sent whole after closing, rather than streamed from their new part
+        self._streamed = upload is not None and not append
+
+    def open(self):
+        """Open the output file and write the header, unless appending to a non-empty file."""
+        mode = 'a' if self.append else 'w'
+        if self.compression is not None:
+            sink = functools.partial(self.upload.write, self.path) if self._streamed else None
+            self._file = BlockCompressedFile(self.path, self.compression, mode, sink=sink)
+        else:
+            self._file = open(self.path, mode, encoding='utf-8', newline='', buffering=FILE_BUFFER)
+        if self.header and not self._file.tell():
+            self._csv.writerow(self.header)
+            self._flush()
+
+    def close(self):
+        """Flush and close the output file."""
+        self._flush()
+        self._file.close()
+
+    def _flush(self):
+        self._write(self._buffer)
+        self._buffer.clear()
+
+    def _write(self, lines):
+        self._file.writelines(lines)
+        # compressed files hand their compressed blocks to the upload pipeline themselves
+        if self._streamed and self.compression is None:
+            self.upload.write(self.path, ''.join(lines).encode('utf-8'))
+
+    def finish_upload(self):
+        """Queue the rest of a streamed file, or send the whole of an appended file."""
+        if self._streamed:
+            self.upload.finish(self.path)
+        else:
+            self.upload.send_file(self.path)
+
+    def write_rows(self, rows):
+        """Write an iterable of rows, flushing the buffer whenever it holds buffer_rows rows."""
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.buffer_rows - len(self._buffer)))
+            if not chunk:
+                break
+            self._csv.writerows(chunk)
+            self.rows += len(chunk)
+            if len(self._buffer) >= self.buffer_rows:
+                self._flush()
+
+    def write_lines(self, lines):
+        """Write an iterable of CSV-formatted lines, such as BaseGenerator.text_lines().
+
+        Lines are added to the buffer as they are, flushing it whenever it holds buffer_rows lines.
+        """
+        lines = iter(lines)
+        while True:
+            chunk = list(islice(lines, self.buffer_rows - len(self._buffer)))
+            if not chunk:
+                break
+            self._buffer.extend(chunk)
+            self.rows += len(chunk)
+            if len(self._buffer) >= self.buffer_rows:
+                self._flush()
+
+    def append_file(self, path, rows):
+        """Copy the contents of a header-less CSV file written by another CSVWriter.
+
+        Args:
+            path (str) path of the file to copy
+            rows (int) number of rows in the copied file
+        """
+        self._flush()
+        with open(path, encoding='utf-8', newline='') as part:
+            for data in iter(lambda: part.read(FILE_BUFFER), ''):
+                self._write((data,))
+        self.rows += rows
@@ -0,0 +1,195 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""CSV Writer splitting its output into size-bounded chunk files."""
+
+import csv
+import hashlib
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from .base import BaseWriter
+from .csv_file import BUFFER_ROWS, _LineBuffer
+
+# number of lines encoded and written at a time
+WRITE_LINES = 8192
+
+
+def _write_chunk(path, header_lines, lines, compression=None):
+    """Write the header and rows of one chunk file, returning its manifest entry."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'wb') as chunk:
+        blocks = [header_lines] + [lines[start:start + WRITE_LINES] for start in range(0, len(lines), WRITE_LINES)]
+        for block in blocks:
+            data = ''.join(block).encode('utf-8')
+            if compression is not None:
+                data = compression.compress(data)
+            chunk.write(data)
+            digest.update(data)
+            size += len(data)
+    return {'key': os.path.basename(path), 'rows': len(lines), 'bytes': size, 'sha256': digest.hexdigest()}
+
+
+class RolloverWriter(BaseWriter):
+    """Writer to split CSV output into numbered chunk files with a manifest.
+
+    A new chunk starts whenever the current one would exceed `max_rows` rows
+    or `max_bytes` bytes. Every chunk has the header. Completed chunks are
+    written, checksummed and uploaded by a pool of `threads` threads while
+    generation carries on; at most two chunks per thread are held in memory.
+
+    Chunk files are named after the report file: report.csv is split into
+    report-1.csv, report-2.csv, ... and described by report-Manifest.json,
+    which lists the key, row count, size and SHA-256 checksum of each chunk.
+    With a compression codec, each chunk file is compressed and named with
+    the codec's suffix, such as report-1.csv.gz. Sizes limit the uncompressed
+    chunks; the manifest lists the size and checksum of the compressed files.
+    """
+
+    def __init__(self, path, header, max_rows=None, max_bytes=None, threads=2, upload=None, compression=None):
+        """Initialize the writer.
+
+        Args:
+            path (str) path of the report file the chunk file names are built from
+            header (list) column names, or None to omit the header
+            max_rows (int) maximum number of rows per chunk, or None
+            max_bytes (int) maximum size of a chunk, in bytes, or None
+            threads (int) number of threads writing chunk files
+            upload (UploadPipeline) pipeline uploading each chunk and the manifest, or None
+            compression (GzipCodec or ZstdCodec) codec compressing each chunk file, or None
+        """
+        super().__init__(path, header, upload=upload)
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.threads = threads
+        self.compression = compression
+        self.chunks = []
+        base, self._extension = os.path.splitext(path)
+        self.manifest_path = f'{base}-Manifest.json'
+
+        self._buffer = _LineBuffer()
+        self._csv = csv.writer(self._buffer)
+        self._header_lines = []
+        self._lines = []
+        self._size = 0
+        self._pending = deque()
+        self._executor = None
+
+    def chunk_path(self, index):
+        """Return the path of the chunk file with a 1-based index."""
+        suffix = self.compression.suffix if self.compression is not None else ''
+        return f'{os.path.splitext(self.path)[0]}-{index}{self._extension}{suffix}'
+
+    def open(self):
+        """Start the chunk writer threads."""
+        self._executor = ThreadPoolExecutor(max_workers=self.threads)
+        if self.header:
+            self._csv.writerow(self.header)
+            self._header_lines = list(self._buffer)
+            self._buffer.clear()
+        self._size = sum(map(len, self._header_lines))
+
+    def close(self):
+        """Write the last chunk, wait for every chunk file, and write the manifest."""
+        try:
+            if self._lines or not (self.chunks or self._pending):
+                self._rollover()
+            while self._pending:
+                self._complete()
+        finally:
+            self._executor.shutdown()
+
+        manifest = {
+            'report': os.path.basename(self.path),
+            'columns': self.header,
+            'rows': self.rows,
+            'bytes': sum(chunk['bytes'] for chunk in self.chunks),
+            'chunks': self.chunks,
+        }
+        partial = f'{self.manifest_path}.{os.getpid()}'
+        with open(partial, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        os.replace(partial, self.manifest_path)
+
+    def size(self):
+        """Return the total size of the chunk files, in bytes."""
+        return sum(chunk['bytes'] for chunk in self.chunks)
+
+    def finish_upload(self):
+        """Upload the manifest. Chunk files are uploaded as they are written."""
+        self.upload.send_file(self.manifest_path)
+
+    def write_rows(self, rows):
+        """Write an iterable of rows."""
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, BUFFER_ROWS))
+            if not chunk:
+                break
+            self._csv.writerows(chunk)
+            self.write_lines(self._buffer)
+            self._buffer.clear()
+
+    def write_lines(self, lines):
+        """Write an iterable of CSV-formatted lines, such as BaseGenerator.text_lines()."""
+        max_rows, max_bytes = self.max_rows, self.max_bytes
+        for line in lines:
+            size = len(line) if line.isascii() else len(line.encode('utf-8'))
+            if self._lines and (
+                (max_rows and len(self._lines) >= max_rows) or (max_bytes and self._size + size > max_bytes)
+            ):
+                self._rollover()
+            self._lines.append(line)
+            self._size += size
+            self.rows += 1
+
+    def append_file(self, path, rows):
+        """Write the lines of a header-less CSV file written by a CSVWriter.
+
+        Args:
+            path (str) path of the file to copy, with no line breaks inside its fields
+            rows (int) number of rows in the copied file
+        """
+        with open(path, encoding='utf-8', newline='') as part:
+            self.write_lines(part)
+
+    def _rollover(self):
+        """Hand the current chunk over to the writer threads, and start a new one."""
+        if len(self._pending) >= 2 * self.threads:
+            self._complete()
+        path = self.chunk_path(len(self.chunks) + len(self._pending) + 1)
+        self._pending.append((path, self._executor.submit(self._write, path, self._lines)))
+        self._lines = []
+        self._size = sum(map(len, self._header_lines))
+
+    def _write(self, path, lines):
+        entry = _write_chunk(path, self._header_lines, lines, self.compression)
+        if self.upload is not None:
+            self.upload.send_file(path)
+        return entry
+
+    def _complete(self):
+        """Wait for the oldest pending chunk file, and add it to the manifest."""
+        _, future = self._pending.popleft()
+        self.chunks.append(future.result())
+
+    def summary(self):
+        """Return a throughput summary for the written chunk files."""
+        return f'{super().summary()} in {len(self.chunks)} chunks, described by {self.manifest_path}'
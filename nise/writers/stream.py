@@ -0,0 +1,147 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Rate-controlled CSV stream Writer."""
+
+import os
+import socket
+import stat
+import sys
+import time
+
+from nise.util import LOG
+from .base import MEGABYTE
+from .csv_file import BUFFER_ROWS, CSVWriter
+
+# number of writes per second when pacing a stream to a row rate
+WRITES_PER_SECOND = 20
+
+# seconds between progress reports of a stream
+STATUS_INTERVAL = 10
+
+
+class StreamWriter(CSVWriter):
+    """Writer to stream CSV rows to stdout, a FIFO or a Unix domain socket.
+
+    The target is "-" for stdout, the path of a listening Unix domain socket,
+    or any other path, such as a FIFO, which is opened for writing. Writes
+    block while the consumer is not reading, so the stream never runs ahead
+    of the consumer; the time spent blocked is reported as stall time. When
+    the consumer disconnects, the write raises BrokenPipeError.
+
+    With a rate, each write is delayed until the rows written so far are due
+    at that many rows per second, and buffers are sized for about
+    WRITES_PER_SECOND writes per second. Without one, rows are written in
+    buffers of buffer_rows lines as fast as the consumer reads them.
+    """
+
+    def __init__(self, path, header, rate=None, buffer_rows=BUFFER_ROWS):
+        """Initialize the writer.
+
+        Args:
+            path (str) stream target: "-", a Unix domain socket or a file path
+            header (list) column names, or None to omit the header
+            rate (float) target rows per second, or None for no limit
+            buffer_rows (int) number of rows buffered between writes, without a rate
+        """
+        if rate:
+            buffer_rows = max(1, min(buffer_rows, int(rate / WRITES_PER_SECOND)))
+        super().__init__(path, header, buffer_rows=buffer_rows)
+        self.rate = rate
+        self.stalled = 0.0
+        self.disconnected = False
+        self._send = None
+        self._close = None
+        self._written = 0
+        self._status_at = None
+
+    def open(self):
+        """Connect to the stream target and write the header."""
+        if self.path == '-':
+            output = sys.stdout.buffer
+            self._send, self._close = output.write, output.flush
+        elif os.path.exists(self.path) and stat.S_ISSOCK(os.stat(self.path).st_mode):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.path)
+            self._send, self._close = sock.sendall, sock.close
+        else:
+            # opening a FIFO blocks until the consumer opens it for reading
+            output = open(self.path, 'wb', buffering=0)
+            self._send, self._close = output.write, output.close
+        self._status_at = time.perf_counter() + STATUS_INTERVAL
+        self._file = self
+        if self.header:
+            self._csv.writerow(self.header)
+            self._flush()
+
+    def close(self):
+        """Flush the buffered rows and disconnect from the stream target, unless the consumer disconnected."""
+        if self.disconnected:
+            if self.path == '-':
+                # stop the interpreter from flushing stdout into the closed pipe at exit
+                os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            else:
+                self._close()
+            return
+        try:
+            self._flush()
+        finally:
+            self._close()
+
+    def tell(self):
+        """Return the number of bytes streamed so far."""
+        return self._written
+
+    def size(self):
+        """Return the number of bytes streamed."""
+        return self._written
+
+    def writelines(self, lines):
+        """Send lines to the stream target, after waiting for the rate if they are ahead of it."""
+        if not lines:
+            return
+        data = ''.join(lines).encode('utf-8')
+        if self.rate:
+            delay = self._started + self.rows / self.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        started = time.perf_counter()
+        try:
+            self._send(data)
+        except BrokenPipeError:
+            self.disconnected = True
+            raise
+        now = time.perf_counter()
+        self.stalled += now - started
+        self._written += len(data)
+        if now >= self._status_at:
+            self._status_at = now + STATUS_INTERVAL
+            LOG.info(self.status(now - self._started))
+
+    def status(self, elapsed):
+        """Return the sustained throughput of the stream after elapsed seconds."""
+        megabytes = self._written / MEGABYTE
+        seconds = elapsed or float('inf')
+        target = f', target {self.rate:.0f} rows/sec' if self.rate else ''
+        return (
+            f'Streamed {self.rows} rows, {megabytes:.2f} MiB to {self.path} in {elapsed:.2f}s '
+            f'({self.rows / seconds:.0f} rows/sec, {megabytes / seconds:.2f} MiB/sec{target}, '
+            f'stalled on the consumer for {self.stalled:.2f}s)'
+        )
+
+    def summary(self):
+        """Return a sustained throughput summary for the stream."""
+        return self.status(self.elapsed)
@@ -1,4 +1,4 @@
-from setuptools import setup
+from setuptools import find_packages, setup
 
 setup(
     name="koku-nise",
@@ -12,20 +12,21 @@ setup(
         "License :: OSI Approved :: GNU Affero General Public License v3",
         "Operating System :: OS Independent",
     ],
-    packages=[
-        "nise",
-    ],
+    packages=find_packages(exclude=["tests", "tests.*"]),
+    package_data={"nise": ["templates/*.yaml", "templates/*/*.yaml"]},
     install_requires=[
         "faker>=3.0",
         "boto3>=1.11",
         "requests>=2.22",
         "jinja2>=2.10",
+        "numpy>=1.17",
         "azure-mgmt-costmanagement>=0.1",
         "azure-mgmt-resource>=7.0",
         "azure-mgmt-storage>=7.1",
         "azure-storage-blob>=12.1",
         "google-cloud-storage>=1.19",
     ],
+    extras_require={"columnar": ["pyarrow>=0.17"], "zstd": ["zstandard>=0.13"]},
     dependency_links=[],
     entry_points={"console_scripts": ["nise = nise.__main__:main"]},
     include_package_data=True,
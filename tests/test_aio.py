@@ -0,0 +1,134 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Tests for the asyncio library API."""
+import asyncio
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import date, datetime
+from unittest import TestCase
+from unittest.mock import patch
+
+import nise
+from nise import aio
+from nise.exceptions import NiseError
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+SEED = 5
+
+
+def cli_reports(start, end):
+    """Run the seeded CLI, and return the rows of its report files without their header."""
+    with tempfile.TemporaryDirectory() as output_dir:
+        args = ["--seed", str(SEED), "--start", start, "--end", end, "--output-dir", output_dir]
+        subprocess.run(
+            [sys.executable, "-m", "nise", *args, "ocp", "--clusterid", "test"],
+            cwd=ROOT_DIR,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        reports = {}
+        for fname in sorted(os.listdir(output_dir)):
+            if not fname.startswith("."):
+                with open(os.path.join(output_dir, fname), newline="") as report:
+                    reports[fname] = list(csv.reader(report))[1:]
+        return reports
+
+
+async def collect(*args, limit=None, **kwargs):
+    """Return the rows of agenerate() as CSV text fields, by report file name."""
+    reports = {}
+    async for fname, batch in nise.agenerate(*args, **kwargs):
+        rows = reports.setdefault(fname, [])
+        rows.extend([["" if value is None else str(value) for value in row] for row in batch.rows()])
+        if limit is not None and sum(map(len, reports.values())) >= limit:
+            break
+    return reports
+
+
+def nise_threads():
+    """Return the running threads of agenerate() executors."""
+    return [thread for thread in threading.enumerate() if thread.name.startswith("nise")]
+
+
+class AgenerateTest(TestCase):
+    """Tests for agenerate()."""
+
+    def test_seeded_batches_match_cli(self):
+        """Seeded batches hold the rows of the CLI's report files, for dates as well as datetimes."""
+        expected = cli_reports("2020-01-01", "2020-01-03")
+        for start, end in ((date(2020, 1, 1), date(2020, 1, 3)), (datetime(2020, 1, 1), datetime(2020, 1, 3))):
+            reports = asyncio.run(collect("ocp", start, end, clusterid="test", seed=SEED, batch_size=500))
+            self.assertEqual(reports, expected)
+
+    def test_invalid_dates(self):
+        """Values other than dates are rejected with a clear error."""
+        with self.assertRaises(NiseError):
+            asyncio.run(collect("ocp", "2020-01-01", date(2020, 1, 3), seed=SEED))
+
+    def test_early_exit(self):
+        """Closing the iterator early stops generation, and a later run is unaffected."""
+
+        async def first_batch():
+            batches = nise.agenerate("ocp", date(2020, 1, 1), date(2020, 1, 3), clusterid="test", seed=SEED)
+            fname, batch = await batches.__anext__()
+            await batches.aclose()
+            return fname, len(batch)
+
+        fname, rows = asyncio.run(first_batch())
+        self.assertTrue(fname.endswith(".csv"))
+        self.assertGreater(rows, 0)
+        self.assertEqual(nise_threads(), [])
+
+        reports = asyncio.run(collect("ocp", date(2020, 1, 1), date(2020, 1, 2), clusterid="test", seed=SEED))
+        self.assertEqual(reports, cli_reports("2020-01-01", "2020-01-02"))
+
+    def test_lookahead(self):
+        """At most `lookahead` batches are requested ahead of a slow consumer, including its next one."""
+        produced = []
+        report_batches = aio.report_batches
+
+        def counted(*args, **kwargs):
+            for item in report_batches(*args, **kwargs):
+                produced.append(item)
+                yield item
+
+        async def consume(lookahead):
+            consumed = 0
+            ahead = []
+            batches = nise.agenerate(
+                "ocp", date(2020, 1, 1), date(2020, 1, 2), seed=SEED, batch_size=50, lookahead=lookahead
+            )
+            async for _ in batches:
+                consumed += 1
+                await asyncio.sleep(0.05)
+                ahead.append(len(produced) - consumed)
+                if consumed == 5:
+                    break
+            await batches.aclose()
+            return ahead
+
+        for lookahead in (1, 3):
+            produced.clear()
+            with patch.object(aio, "report_batches", counted):
+                ahead = asyncio.run(consume(lookahead))
+            # while the consumer holds a batch, its next batch and the ones after it are generated
+            self.assertEqual(max(ahead), lookahead - 1)
@@ -0,0 +1,110 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Tests for appending to existing report files."""
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def run_nise(output_dir, *args, seed="7"):
+    """Run the CLI for the test cluster, writing its report files to a directory."""
+    return subprocess.run(
+        [sys.executable, "-m", "nise", "--seed", seed, *args, "--output-dir", output_dir, "ocp", "--clusterid", "test"],
+        cwd=ROOT_DIR,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+
+def read_reports(output_dir):
+    """Return the rows of the report files in a directory, by file name."""
+    reports = {}
+    for fname in sorted(os.listdir(output_dir)):
+        if fname.startswith("."):
+            continue
+        with open(os.path.join(output_dir, fname), newline="") as report:
+            reports[fname] = list(csv.reader(report))
+    return reports
+
+
+class AppendTest(TestCase):
+    """Tests for --append."""
+
+    def setUp(self):
+        """Create output directories for a full run and an appended run."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.full_dir = os.path.join(self.tmpdir.name, "full")
+        self.append_dir = os.path.join(self.tmpdir.name, "append")
+        os.makedirs(self.full_dir)
+        os.makedirs(self.append_dir)
+
+    def tearDown(self):
+        """Remove the output directories."""
+        self.tmpdir.cleanup()
+
+    def test_append_matches_full_run(self):
+        """Appended files equal the files of a full run, except for the report period end of earlier rows.
+
+        Rows are only appended, so rows written before the append keep the
+        report period end of the run that wrote them.
+        """
+        run_nise(self.full_dir, "--start", "2020-01-01", "--end", "2020-01-04").check_returncode()
+        run_nise(self.append_dir, "--start", "2020-01-01", "--end", "2020-01-02").check_returncode()
+        earlier = {fname: len(rows) for fname, rows in read_reports(self.append_dir).items()}
+        run_nise(self.append_dir, "--start", "2020-01-01", "--end", "2020-01-04", "--append").check_returncode()
+
+        full = read_reports(self.full_dir)
+        appended = read_reports(self.append_dir)
+        self.assertEqual(len(full), 3)
+        self.assertEqual(set(appended), set(full))
+        for fname, rows in full.items():
+            self.assertEqual(appended[fname][0], rows[0])
+            self.assertEqual(len(appended[fname]), len(rows))
+            index = rows[0].index("report_period_end")
+            for number, (row, expected) in enumerate(zip(appended[fname][1:], rows[1:]), start=1):
+                self.assertEqual(expected[index], "2020-01-04")
+                self.assertEqual(row[index], "2020-01-02" if number < earlier[fname] else "2020-01-04")
+                self.assertEqual(row[:index] + row[index + 1:], expected[:index] + expected[index + 1:])
+
+    def test_checkpoint_is_compact_json(self):
+        """One JSON checkpoint describes the report set, with the sizes of the cluster and the files."""
+        run_nise(self.append_dir, "--start", "2020-01-01", "--end", "2020-01-02").check_returncode()
+        checkpoints = [fname for fname in os.listdir(self.append_dir) if fname.endswith(".checkpoint")]
+        self.assertEqual(checkpoints, [".1-2020-test-ocp.checkpoint"])
+        with open(os.path.join(self.append_dir, checkpoints[0])) as cached:
+            checkpoint = json.load(cached)
+        self.assertEqual(checkpoint["seed"], 7)
+        self.assertEqual(checkpoint["clusterid"], "test")
+        self.assertEqual(set(checkpoint["sizes"]), {"nodes", "namespaces", "pods", "volumes"})
+        for fname, size in checkpoint["files"].items():
+            self.assertEqual(os.path.getsize(os.path.join(self.append_dir, fname)), size)
+
+    def test_seed_mismatch(self):
+        """Appending with a different seed than the checkpointed files fails, leaving them unchanged."""
+        run_nise(self.append_dir, "--start", "2020-01-01", "--end", "2020-01-02").check_returncode()
+        before = read_reports(self.append_dir)
+        result = run_nise(self.append_dir, "--start", "2020-01-01", "--end", "2020-01-04", "--append", seed="8")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn(b"[ERROR] Unable to append: report files were generated with --seed 7.", result.stdout)
+        self.assertNotIn(b"Traceback", result.stderr)
+        self.assertEqual(read_reports(self.append_dir), before)
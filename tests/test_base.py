@@ -0,0 +1,65 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Tests for the row plans of BaseGenerator."""
+from unittest import TestCase
+
+from nise.generators.base import BaseGenerator, MAX_PLANS
+from nise.util.fake import seed_all
+
+
+class BrokenGenerator(BaseGenerator):
+    """A generator with a column type that cannot be generated."""
+
+    def gen_broken(self, **kwargs):
+        """Fail with an AttributeError."""
+        return kwargs.get("missing").value
+
+
+def columns(index):
+    """Return column definitions with a distinct default."""
+    return [{"name": "name", "type": "other", "default": f"value-{index}"}]
+
+
+class PlanTest(TestCase):
+    """Tests for compiled row plans."""
+
+    def test_plan_cache_is_bounded(self):
+        """Only the most recently used plans are kept, and they are reused."""
+        generator = BaseGenerator({"filename": "test.csv", "columns": columns(0)})
+        lines = generator.lines()
+        self.assertEqual(next(lines), ["value-0"])
+        for index in range(1, 3 * MAX_PLANS):
+            self.assertEqual(lines.send(columns(index)), [f"value-{index}"])
+        self.assertEqual(len(generator._plans), MAX_PLANS)
+
+        plan = generator.compile(columns(3 * MAX_PLANS - 1))
+        self.assertIs(generator.compile(columns(3 * MAX_PLANS - 1)), plan)
+
+    def test_attribute_error_uses_default(self):
+        """A gen_* method raising AttributeError gives the column's default value, without stopping the run."""
+        seed_all(1)
+        config = {
+            "filename": "test.csv",
+            "columns": [
+                {"name": "broken", "type": "broken", "default": "fallback"},
+                {"name": "word", "type": "string", "format": "{}", "seed": ["a"]},
+            ],
+        }
+        lines = BrokenGenerator(config).lines()
+        with self.assertLogs("nise.util.log", level="INFO") as logs:
+            self.assertEqual([next(lines) for _ in range(3)], [["fallback", "a"]] * 3)
+        self.assertIn("Using default value for column 'broken'", logs.output[0])
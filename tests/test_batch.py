@@ -0,0 +1,116 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Tests for column-oriented batches of generated rows."""
+import re
+from datetime import datetime
+from unittest import TestCase
+
+import numpy as np
+
+from nise.config import load_configs
+from nise.generators import get_generator
+from nise.generators.base import BaseGenerator
+from nise.generators.batch import MAX_DICTIONARY, decode, format_columns
+from nise.util import get_from_config
+from nise.util.fake import seed_all
+
+SEED = 9
+
+
+def ocp_generators():
+    """Return seeded OCP generators for two days."""
+    seed_all(SEED)
+    generator_class = get_generator("ocp")
+    configs = load_configs("ocp", seed=SEED, report_month=1, report_year=2020, clusterid="test")
+    for config in configs:
+        get_from_config("name", generator_class._period_start, config)["default"] = datetime(2020, 1, 1)
+        get_from_config("name", generator_class._period_end, config)["default"] = datetime(2020, 1, 3)
+    return generator_class.report_set(configs)
+
+
+class FormatColumnsTest(TestCase):
+    """Tests for format_columns()."""
+
+    def setUp(self):
+        """Create columns of numbers and strings."""
+        self.numbers = np.array([1, 22, 333], dtype=object)
+        self.words = np.array(["x", "y,z", "w"], dtype=object)
+
+    def check(self, colformat, *fields):
+        """Check that format_columns() formats every row as str.format() does."""
+        expected = [colformat.format(*row) for row in zip(*fields)]
+        self.assertEqual(list(format_columns(colformat, list(fields))), expected)
+
+    def test_plain_fields(self):
+        """Literal text and plain fields are concatenated."""
+        self.check("{}-{}.", self.words, self.numbers)
+
+    def test_format_spec(self):
+        """Format specs are applied to every value."""
+        self.check("n{:03d}", self.numbers)
+        self.check("{:>5}|{:.1f}", self.words, self.numbers)
+
+    def test_conversion(self):
+        """Conversions are applied before format specs."""
+        self.check("{!r}:{!s:>4}", self.words, self.numbers)
+
+    def test_explicit_indexes(self):
+        """Explicit indexes select the field, and may repeat it."""
+        self.check("{1}-{0}-{1}", self.words, self.numbers)
+        self.check("{0:03d}/{0}", self.numbers)
+
+    def test_item_fields(self):
+        """Fields with item lookups are formatted by str.format()."""
+        self.check("{0[0]}{1}", self.words, self.numbers)
+
+    def test_mixed_numbering(self):
+        """Formats mixing automatic and explicit field numbering are rejected as str.format() rejects them."""
+        for colformat in ("{}-{1}", "{0}-{}", "{0:>{}}", "{[0]}{1}"):
+            with self.assertRaises(ValueError) as expected:
+                colformat.format(*zip(self.words, self.numbers))
+            with self.assertRaises(ValueError) as raised:
+                format_columns(colformat, [self.words, self.numbers])
+            self.assertEqual(str(raised.exception), str(expected.exception))
+            with self.assertRaises(ValueError):
+                format_columns(colformat, [self.words[:0], self.numbers[:0]])
+
+
+class BatchesTest(TestCase):
+    """Tests for batches()."""
+
+    def test_batches_match_lines(self):
+        """Decoded batches hold the rows of lines()."""
+        expected = [list(generator.lines()) for generator in ocp_generators()]
+        for generator, lines in zip(ocp_generators(), expected):
+            rows = []
+            for batch in generator.batches(size=100):
+                self.assertEqual(batch.names, generator.header)
+                rows.extend(zip(*[decode(column).tolist() for column in batch.columns]))
+            self.assertTrue(lines)
+            self.assertEqual([list(row) for row in rows], lines)
+
+    def test_formatted_strings_beyond_dictionary(self):
+        """Formatted strings with too many combinations for a dictionary keep their format spec."""
+        seed_all(SEED)
+        generator = BaseGenerator({"filename": "test.csv", "columns": []})
+        values = list(range(300))
+        self.assertGreater(len(values) ** 2, MAX_DICTIONARY)
+        column = {"name": "name", "type": "string", "format": "n{:03d}-{!r}", "seed": values}
+        formatted = generator.compile_batch_column(column)(0, 1000)
+        self.assertEqual(len(formatted), 1000)
+        for value in formatted:
+            self.assertRegex(value, re.compile(r"^n\d{3}-\d{1,3}$"))
@@ -0,0 +1,125 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Tests for generating the reports of several clusters."""
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from nise.__main__ import cluster_list, cluster_seed, parse_args, plan_jobs
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+REPORTS = ["ocp_node_label.csv", "ocp_pod_usage.csv", "ocp_storage_usage.csv"]
+
+
+def cli_args(*ocp_args, options=()):
+    """Parse the arguments of an ocp run for two days."""
+    argv = ["nise", *options, "--start", "2020-01-01", "--end", "2020-01-03", "ocp", "--clusterid", "test", *ocp_args]
+    with patch.object(sys, "argv", argv):
+        return parse_args()
+
+
+def run_nise(output_dir, *ocp_args, options=()):
+    """Run the seeded CLI for a day, and return the contents of its report files by file name."""
+    args = ["--seed", "3", *options, "--start", "2020-01-01", "--end", "2020-01-02", "--output-dir", output_dir]
+    subprocess.run(
+        [sys.executable, "-m", "nise", *args, "ocp", "--clusterid", "test", *ocp_args],
+        cwd=ROOT_DIR,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    reports = {}
+    for fname in sorted(os.listdir(output_dir)):
+        if not fname.startswith("."):
+            with open(os.path.join(output_dir, fname), "rb") as report:
+                reports[fname] = report.read()
+    return reports
+
+
+class ClusterListTest(TestCase):
+    """Tests for cluster_list() and cluster_seed()."""
+
+    def setUp(self):
+        """Create a directory for cluster files."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Remove the directory."""
+        self.tmpdir.cleanup()
+
+    def test_numbered_clusters(self):
+        """--clusters N names the clusters after the cluster id, with a 3-digit number."""
+        args = cli_args("--clusters", "3")
+        self.assertEqual(cluster_list(args), [("test-001", 1.0), ("test-002", 1.0), ("test-003", 1.0)])
+
+    def test_single_cluster(self):
+        """Without --clusters or --cluster-file, there is no fan-out."""
+        self.assertIsNone(cluster_list(cli_args()))
+
+    def test_cluster_file(self):
+        """Cluster files list one cluster id per line with an optional scale, ignoring comments and blank lines."""
+        path = os.path.join(self.tmpdir.name, "clusters.txt")
+        with open(path, "w") as cluster_file:
+            cluster_file.write("# fleet\nsmall 0.5\n\nlarge 4  # busy\nplain\n")
+        args = cli_args("--cluster-file", path)
+        self.assertEqual(cluster_list(args), [("small", 0.5), ("large", 4.0), ("plain", 1.0)])
+
+    def test_cluster_seed(self):
+        """Cluster seeds depend only on the seed and the cluster id."""
+        self.assertEqual(cluster_seed(3, "test-001"), cluster_seed(3, "test-001"))
+        self.assertNotEqual(cluster_seed(3, "test-001"), cluster_seed(3, "test-002"))
+        self.assertNotEqual(cluster_seed(3, "test-001"), cluster_seed(4, "test-001"))
+
+    def test_jobs_are_seeded_per_cluster(self):
+        """Each cluster's job is seeded with its cluster seed, and jobs are ordered largest first."""
+        path = os.path.join(self.tmpdir.name, "clusters.txt")
+        with open(path, "w") as cluster_file:
+            cluster_file.write("small 0.5\nlarge 4\nplain\n")
+        jobs = plan_jobs(cli_args("--cluster-file", path, options=["--seed", "3"]))
+        clusters = [(job.clusterid, scale) for job, scale in jobs]
+        self.assertEqual(clusters, [("large", 4.0), ("plain", 1.0), ("small", 0.5)])
+        for job, _ in jobs:
+            self.assertEqual(job.seed, cluster_seed(3, job.clusterid))
+
+
+class FanOutTest(TestCase):
+    """Tests for the report files of a fan-out."""
+
+    def test_file_names(self):
+        """Each cluster writes its own report files, named after its cluster id."""
+        with tempfile.TemporaryDirectory() as output_dir:
+            reports = run_nise(output_dir, "--clusters", "2")
+        expected = [f"1-2020-test-{idx:03d}-{report}" for idx in (1, 2) for report in REPORTS]
+        self.assertEqual(sorted(reports), sorted(expected))
+        self.assertNotEqual(reports[expected[1]], reports[expected[4]])
+
+    def test_cluster_reports_are_independent(self):
+        """A cluster's reports do not depend on the other clusters or on the number of workers."""
+        with tempfile.TemporaryDirectory() as output_dir:
+            path = os.path.join(output_dir, "clusters.txt")
+            with open(path, "w") as cluster_file:
+                cluster_file.write("alpha\nbeta 2\n")
+            fleet = run_nise(os.path.join(output_dir, "fleet"), "--cluster-file", path)
+            with open(path, "w") as cluster_file:
+                cluster_file.write("beta 2\n")
+            single = run_nise(os.path.join(output_dir, "single"), "--cluster-file", path, options=["--workers", "2"])
+        expected = [f"1-2020-{name}-{report}" for name in ("alpha", "beta") for report in REPORTS]
+        self.assertEqual(sorted(fleet), sorted(expected))
+        self.assertEqual(single, {fname: contents for fname, contents in fleet.items() if "-beta-" in fname})
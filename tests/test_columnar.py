@@ -0,0 +1,135 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Tests for Parquet and Arrow IPC report files."""
+import os
+import tempfile
+from datetime import datetime
+from unittest import TestCase, skipUnless
+
+import numpy as np
+
+from nise.config import load_configs
+from nise.generators import get_generator
+from nise.generators.batch import DictionaryArray, TimestampArray, decode
+from nise.util import get_from_config
+from nise.util.fake import seed_all
+from nise.writers import ArrowWriter, ParquetWriter
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+SEED = 4
+
+
+def ocp_generators():
+    """Return seeded OCP generators for two days."""
+    seed_all(SEED)
+    generator_class = get_generator("ocp")
+    configs = load_configs("ocp", seed=SEED, report_month=1, report_year=2020, clusterid="test")
+    for config in configs:
+        get_from_config("name", generator_class._period_start, config)["default"] = datetime(2020, 1, 1)
+        get_from_config("name", generator_class._period_end, config)["default"] = datetime(2020, 1, 3)
+    return generator_class.report_set(configs)
+
+
+def batch_columns(generator):
+    """Return the columns of a generator's batches, concatenated."""
+    columns = None
+    for batch in generator.batches(size=500):
+        if columns is None:
+            columns = [[] for _ in batch.columns]
+        for values, column in zip(columns, batch.columns):
+            values.append(column)
+    return columns
+
+
+@skipUnless(pyarrow, "pyarrow is not installed")
+class ColumnarWriterTest(TestCase):
+    """Tests for ParquetWriter and ArrowWriter."""
+
+    def setUp(self):
+        """Create an output directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Remove the output directory."""
+        self.tmpdir.cleanup()
+
+    def write(self, writer_class, generator):
+        """Write a generator's batches, and return the writer."""
+        path = os.path.join(self.tmpdir.name, f"{generator.config['filename']}{writer_class.extension}")
+        with writer_class(path, generator.header, generator.column_types) as writer:
+            writer.write_batches(generator.batches(size=500))
+        return writer
+
+    def check_values(self, table, columns):
+        """Check that the columns of a table hold the values of the batch columns."""
+        for field, name, chunks in zip(table.schema, table.column_names, columns):
+            values = table.column(name)
+            if isinstance(chunks[0], TimestampArray):
+                seconds = values.cast(pyarrow.timestamp("s", tz="UTC")).cast(pyarrow.int64()).to_pylist()
+                expected = np.concatenate([chunk.values for chunk in chunks]).astype("datetime64[s]").astype(np.int64)
+                self.assertEqual(seconds, expected.tolist(), name)
+            else:
+                expected = np.concatenate([decode(chunk) for chunk in chunks]).tolist()
+                self.assertEqual(values.to_pylist(), expected, name)
+            if isinstance(chunks[0], DictionaryArray):
+                self.assertTrue(pyarrow.types.is_dictionary(field.type), name)
+
+    def test_arrow_round_trip(self):
+        """Arrow IPC files hold the writer's schema and the values of the batches."""
+        expected = [batch_columns(generator) for generator in ocp_generators()]
+        for generator, columns in zip(ocp_generators(), expected):
+            writer = self.write(ArrowWriter, generator)
+            with pyarrow.ipc.open_file(writer.path) as reader:
+                table = reader.read_all()
+            self.assertEqual(table.schema, writer.schema)
+            self.assertEqual(table.column_names, generator.header)
+            self.assertEqual(table.num_rows, writer.rows)
+            self.check_values(table, columns)
+
+    def test_parquet_round_trip(self):
+        """Parquet files hold the writer's schema, with timestamps in milliseconds, and the values of the batches."""
+        expected = [batch_columns(generator) for generator in ocp_generators()]
+        for generator, columns in zip(ocp_generators(), expected):
+            writer = self.write(ParquetWriter, generator)
+            table = pyarrow.parquet.read_table(writer.path)
+            # Parquet has no timestamp unit for seconds
+            milliseconds = pyarrow.timestamp("ms", tz="UTC")
+            schema = pyarrow.schema(
+                [
+                    field.with_type(milliseconds) if pyarrow.types.is_timestamp(field.type) else field
+                    for field in writer.schema
+                ]
+            )
+            self.assertEqual(table.schema, schema)
+            self.assertEqual(table.num_rows, writer.rows)
+            self.assertEqual(pyarrow.parquet.ParquetFile(writer.path).num_row_groups, -(-writer.rows // 500))
+            self.check_values(table, columns)
+
+    def test_schema_types(self):
+        """Timestamps, dictionary-encoded strings and numeric calc columns keep their types."""
+        generator = ocp_generators()[1]
+        writer = self.write(ArrowWriter, generator)
+        types = dict(zip(writer.schema.names, writer.schema.types))
+        self.assertEqual(types["interval_start"], pyarrow.timestamp("s", tz="UTC"))
+        self.assertTrue(pyarrow.types.is_dictionary(types["pod"]))
+        self.assertTrue(any(pyarrow.types.is_floating(datatype) for datatype in types.values()))
+        self.assertTrue(any(pyarrow.types.is_integer(datatype) for datatype in types.values()))
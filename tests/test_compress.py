@@ -0,0 +1,146 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Tests for block-compressed report files."""
+import gzip
+import io
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase, skipUnless
+
+from nise.writers import CSVWriter
+from nise.writers.compress import BlockCompressedFile, GzipCodec, ZstdCodec
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+HEADER = ["index", "name", "note"]
+
+ROWS = [[idx, f"name-{idx % 7}", "a, quoted \"note\" é" * (idx % 3)] for idx in range(5000)]
+
+
+def gunzip(data):
+    """Decompress concatenated gzip members."""
+    return gzip.decompress(data)
+
+
+def unzstd(data):
+    """Decompress concatenated zstd frames."""
+    reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=True)
+    return reader.read()
+
+
+class BlockCompressedFileTest(TestCase):
+    """Tests for BlockCompressedFile."""
+
+    def setUp(self):
+        """Create an output directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "report.csv")
+
+    def tearDown(self):
+        """Remove the output directory."""
+        self.tmpdir.cleanup()
+
+    def read(self, path):
+        """Return the contents of a file."""
+        with open(path, "rb") as output:
+            return output.read()
+
+    def expected(self):
+        """Return the bytes of ROWS written by an uncompressed CSVWriter."""
+        with CSVWriter(self.path, HEADER) as writer:
+            writer.write_rows(ROWS)
+        return self.read(self.path)
+
+    def check(self, codec, decompress):
+        """Check that block-compressed files decompress to the bytes written into them."""
+        expected = self.expected()
+        blocks = []
+        path = self.path + codec.suffix
+        output = BlockCompressedFile(path, codec, threads=3, block_size=4096, sink=blocks.append)
+        text = expected.decode("utf-8")
+        for offset in range(0, len(text), 1000):
+            output.write(text[offset:offset + 1000])
+        output.close()
+        data = self.read(path)
+        self.assertGreater(len(blocks), 10)
+        self.assertEqual(b"".join(blocks), data)
+        self.assertEqual(decompress(data), expected)
+        for block in blocks:
+            self.assertLessEqual(len(decompress(block)), 4096 + 4000)
+
+    def test_gzip_blocks(self):
+        """Gzip members decompress, in order, to the written bytes."""
+        self.check(GzipCodec(), gunzip)
+
+    @skipUnless(zstandard, "zstandard is not installed")
+    def test_zstd_blocks(self):
+        """Zstd frames decompress, in order, to the written bytes."""
+        self.check(ZstdCodec(), unzstd)
+
+    def test_compressed_writer(self):
+        """Compressed CSVWriter output decompresses to the CSV bytes of an uncompressed writer."""
+        expected = self.expected()
+        codecs = [(GzipCodec(), gunzip)]
+        if zstandard is not None:
+            codecs.append((ZstdCodec(), unzstd))
+        for codec, decompress in codecs:
+            path = self.path + codec.suffix
+            with CSVWriter(path, HEADER, buffer_rows=100, compression=codec) as writer:
+                writer.write_rows(ROWS)
+            self.assertEqual(decompress(self.read(path)), expected)
+
+
+class CompressOptionTest(TestCase):
+    """Tests for --compress."""
+
+    def run_nise(self, output_dir, *args):
+        """Run the seeded CLI, and return the contents of its report files by file name."""
+        args = ["--seed", "3", "--start", "2020-01-01", "--end", "2020-01-02", *args, "--output-dir", output_dir]
+        subprocess.run(
+            [sys.executable, "-m", "nise", *args, "ocp", "--clusterid", "test"],
+            cwd=ROOT_DIR,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        reports = {}
+        for fname in sorted(os.listdir(output_dir)):
+            if not fname.startswith("."):
+                with open(os.path.join(output_dir, fname), "rb") as report:
+                    reports[fname] = report.read()
+        return reports
+
+    def test_compressed_reports(self):
+        """Compressed report files decompress to the files of an uncompressed run."""
+        with tempfile.TemporaryDirectory() as output_dir:
+            expected = self.run_nise(os.path.join(output_dir, "csv"))
+        self.assertEqual(len(expected), 3)
+        options = [("gzip", ".gz", gunzip)]
+        if zstandard is not None:
+            options.append(("zstd", ".zst", unzstd))
+        for option, suffix, decompress in options:
+            with tempfile.TemporaryDirectory() as output_dir:
+                reports = self.run_nise(output_dir, "--compress", option)
+            self.assertEqual(sorted(reports), sorted(fname + suffix for fname in expected))
+            for fname, contents in expected.items():
+                self.assertEqual(decompress(reports[fname + suffix]), contents, fname)
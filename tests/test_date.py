@@ -0,0 +1,64 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Tests for the date-based generators."""
+from datetime import datetime
+from unittest import TestCase
+
+from nise.config import load_configs
+from nise.generators import get_generator
+from nise.generators.date import interleave
+from nise.util import get_from_config
+from nise.util.fake import seed_all
+
+SEED = 5
+
+
+def ocp_generators():
+    """Return seeded OCP generators for two days, with an extra column that is not modelled by the topology."""
+    seed_all(SEED)
+    generator_class = get_generator("ocp")
+    configs = load_configs("ocp", seed=SEED, report_month=1, report_year=2020, clusterid="test")
+    for config in configs:
+        get_from_config("name", generator_class._period_start, config)["default"] = datetime(2020, 1, 1)
+        get_from_config("name", generator_class._period_end, config)["default"] = datetime(2020, 1, 3)
+        config["columns"].append({"name": "extra", "type": "string", "format": "{}-{}", "seed": ["a", "b", "c"]})
+    return generator_class.report_set(configs)
+
+
+class InterleaveTest(TestCase):
+    """Tests for interleave()."""
+
+    def test_interleaved_rows_match_separate_rows(self):
+        """Interleaving reports does not change the random values of any report."""
+        generators = ocp_generators()
+        interleaved = [[] for _ in generators]
+        for index, lines in interleave(generators, "text_lines"):
+            interleaved[index].extend(lines)
+
+        separate = [list(generator.text_lines()) for generator in ocp_generators()]
+        for lines, expected in zip(interleaved, separate):
+            self.assertTrue(expected)
+            self.assertEqual(lines, expected)
+
+    def test_rows_per_interval(self):
+        """Each step yields the rows of one interval of one report, in report order."""
+        generators = ocp_generators()
+        steps = list(interleave(generators, "text_lines"))
+        self.assertEqual(len(steps), 48 * len(generators))
+        for step, (index, lines) in enumerate(steps):
+            self.assertEqual(index, step % len(generators))
+            self.assertEqual(len(lines), generators[index].rows_per_interval)
@@ -0,0 +1,108 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Tests for the OpenShift usage metrics model."""
+import csv
+from datetime import datetime
+from decimal import Decimal
+from unittest import TestCase
+
+from nise.config import load_configs
+from nise.generators import get_generator
+from nise.generators.metrics import ALLOCATABLE, INTERVAL_SECONDS
+from nise.util import get_from_config
+from nise.util.fake import seed_all
+
+SEED = 11
+
+
+def report_rows():
+    """Return the rows of seeded OCP reports over three days, as dicts keyed by report file name."""
+    seed_all(SEED)
+    generator_class = get_generator("ocp")
+    configs = load_configs("ocp", seed=SEED, report_month=1, report_year=2020, clusterid="test")
+    for config in configs:
+        get_from_config("name", generator_class._period_start, config)["default"] = datetime(2020, 1, 1)
+        get_from_config("name", generator_class._period_end, config)["default"] = datetime(2020, 1, 4)
+    reports = {}
+    for generator in generator_class.report_set(configs):
+        name = generator.config.get("filename").rsplit("-", 1)[-1]
+        reports[name] = list(csv.DictReader(generator.text_lines(), fieldnames=generator.header))
+    return reports
+
+
+class UsageModelTest(TestCase):
+    """Tests for the metrics of generated OCP reports."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Generate the reports once for all tests."""
+        cls.reports = report_rows()
+
+    def test_pod_usage_within_request_limit_and_capacity(self):
+        """Pod usage never exceeds the request, the request the limit, or the limit the node capacity."""
+        rows = self.reports["ocp_pod_usage.csv"]
+        self.assertTrue(rows)
+        for row in rows:
+            for resource, capacity in (("cpu_core", "node_capacity_cpu_core_seconds"),
+                                       ("memory_byte", "node_capacity_memory_byte_seconds")):
+                usage = Decimal(row[f"pod_usage_{resource}_seconds"])
+                request = Decimal(row[f"pod_request_{resource}_seconds"])
+                limit = Decimal(row[f"pod_limit_{resource}_seconds"])
+                self.assertGreaterEqual(usage, 0)
+                self.assertLessEqual(usage, request)
+                self.assertLessEqual(request, limit)
+                self.assertLessEqual(limit, Decimal(row[capacity]))
+
+    def test_node_requests_within_allocatable_capacity(self):
+        """The requests of all pods on a node fit in the node's allocatable capacity, every hour."""
+        totals = {}
+        for row in self.reports["ocp_pod_usage.csv"]:
+            for resource, capacity in (("cpu_core", "node_capacity_cpu_core_seconds"),
+                                       ("memory_byte", "node_capacity_memory_byte_seconds")):
+                key = (row["interval_start"], row["node"], resource)
+                total = totals.setdefault(key, [Decimal(0), Decimal(row[capacity])])
+                total[0] += Decimal(row[f"pod_request_{resource}_seconds"])
+        self.assertTrue(totals)
+        for requested, capacity in totals.values():
+            self.assertLessEqual(requested, capacity * Decimal(ALLOCATABLE))
+
+    def test_volume_usage_within_request_and_capacity(self):
+        """Volume usage never exceeds the request, or the request the claim capacity."""
+        rows = self.reports["ocp_storage_usage.csv"]
+        self.assertTrue(rows)
+        for row in rows:
+            usage = int(row["persistentvolumeclaim_usage_byte_seconds"])
+            request = int(row["volume_request_storage_byte_seconds"])
+            self.assertGreaterEqual(usage, 0)
+            self.assertLessEqual(usage, request)
+            self.assertLessEqual(request, int(row["persistentvolumeclaim_capacity_byte_seconds"]))
+
+    def test_seconds_are_hourly_values(self):
+        """Capacity seconds columns are the capacity times the seconds of one interval."""
+        for row in self.reports["ocp_pod_usage.csv"]:
+            self.assertEqual(
+                int(row["node_capacity_cpu_core_seconds"]), int(row["node_capacity_cpu_cores"]) * INTERVAL_SECONDS
+            )
+            self.assertEqual(
+                int(row["node_capacity_memory_byte_seconds"]),
+                int(row["node_capacity_memory_bytes"]) * INTERVAL_SECONDS,
+            )
+        for row in self.reports["ocp_storage_usage.csv"]:
+            self.assertEqual(
+                int(row["persistentvolumeclaim_capacity_byte_seconds"]),
+                int(row["persistentvolumeclaim_capacity_bytes"]) * INTERVAL_SECONDS,
+            )
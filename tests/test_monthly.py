@@ -0,0 +1,104 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Tests for monthly report periods."""
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+from unittest.mock import patch
+
+from nise.__main__ import parse_args, plan_jobs, report_periods
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+class ReportPeriodsTest(TestCase):
+    """Tests for report_periods()."""
+
+    def test_periods_are_clipped_to_range(self):
+        """Periods are calendar months, and their intervals are the part of each month within the range."""
+        periods = report_periods(datetime(2020, 1, 31), datetime(2020, 3, 2))
+        self.assertEqual(
+            periods,
+            [
+                (datetime(2020, 1, 1), datetime(2020, 2, 1), datetime(2020, 1, 31), datetime(2020, 2, 1)),
+                (datetime(2020, 2, 1), datetime(2020, 3, 1), datetime(2020, 2, 1), datetime(2020, 3, 1)),
+                (datetime(2020, 3, 1), datetime(2020, 4, 1), datetime(2020, 3, 1), datetime(2020, 3, 2)),
+            ],
+        )
+
+    def test_year_boundary(self):
+        """Periods continue from December into January of the next year."""
+        periods = report_periods(datetime(2019, 12, 15), datetime(2020, 1, 10))
+        self.assertEqual([start for start, _, _, _ in periods], [datetime(2019, 12, 1), datetime(2020, 1, 1)])
+        self.assertEqual(periods[0][1], datetime(2020, 1, 1))
+
+    def test_range_ending_on_month_start(self):
+        """A range ending on the 1st of a month has no period for that month."""
+        january, february = datetime(2020, 1, 1), datetime(2020, 2, 1)
+        self.assertEqual(report_periods(january, february), [(january, february, january, february)])
+
+    def test_months_share_a_seed(self):
+        """Unseeded monthly jobs of a cluster are given one seed, so that every month describes the same cluster."""
+        argv = ["nise", "--monthly", "--start", "2020-01-15", "--end", "2020-03-15", "ocp", "--clusterid", "test"]
+        with patch.object(sys, "argv", argv):
+            jobs = plan_jobs(parse_args())
+        self.assertEqual(len(jobs), 3)
+        self.assertIsNotNone(jobs[0][0].seed)
+        self.assertEqual({job.seed for job, _ in jobs}, {jobs[0][0].seed})
+        # largest first: February is the only full month
+        self.assertEqual(jobs[0][0].start_date, datetime(2020, 2, 1))
+
+
+class MonthlyReportsTest(TestCase):
+    """Tests for the report files of --monthly."""
+
+    def test_monthly_report_files(self):
+        """Each month has its own report files, with rows for the part of the month within the range."""
+        with tempfile.TemporaryDirectory() as output_dir:
+            args = ["--seed", "3", "--monthly", "--start", "2020-01-31", "--end", "2020-03-02"]
+            subprocess.run(
+                [sys.executable, "-m", "nise", *args, "--output-dir", output_dir, "ocp", "--clusterid", "test"],
+                cwd=ROOT_DIR,
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+            reports = {}
+            for month in (1, 2, 3):
+                with open(os.path.join(output_dir, f"{month}-2020-test-ocp_pod_usage.csv"), newline="") as report:
+                    reports[month] = list(csv.DictReader(report))
+
+        expected = {
+            1: ("2020-01-01", "2020-02-01", "2020-01-31 00:00:00", "2020-01-31 23:00:00"),
+            2: ("2020-02-01", "2020-03-01", "2020-02-01 00:00:00", "2020-02-29 23:00:00"),
+            3: ("2020-03-01", "2020-04-01", "2020-03-01 00:00:00", "2020-03-01 23:00:00"),
+        }
+        for month, rows in reports.items():
+            period_start, period_end, first, last = expected[month]
+            self.assertEqual({row["report_period_start"] for row in rows}, {period_start})
+            self.assertEqual({row["report_period_end"] for row in rows}, {period_end})
+            intervals = sorted({row["interval_start"] for row in rows})
+            self.assertTrue(intervals[0].startswith(first), intervals[0])
+            self.assertTrue(intervals[-1].startswith(last), intervals[-1])
+            self.assertEqual(len(intervals), (24, 29 * 24, 24)[month - 1])
+        # every month describes the same pods
+        pods = [{row["pod"] for row in rows} for rows in reports.values()]
+        self.assertEqual(pods[0], pods[1])
+        self.assertEqual(pods[1], pods[2])
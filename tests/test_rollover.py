@@ -0,0 +1,113 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Tests for splitting CSV reports into chunk files with a manifest."""
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from nise.writers import CSVWriter, RolloverWriter
+from nise.writers.compress import GzipCodec
+
+HEADER = ["index", "name", "note"]
+
+# rows of varying length, some of them with fields that need quoting
+ROWS = [[idx, f"name-{idx % 7}", "a, quoted \"note\"" * (idx % 3)] for idx in range(1000)]
+
+
+class RolloverWriterTest(TestCase):
+    """Tests for RolloverWriter."""
+
+    def setUp(self):
+        """Create an output directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "report.csv")
+
+    def tearDown(self):
+        """Remove the output directory."""
+        self.tmpdir.cleanup()
+
+    def write(self, **kwargs):
+        """Write ROWS into chunk files, and return the manifest."""
+        with RolloverWriter(self.path, HEADER, threads=3, **kwargs) as writer:
+            writer.write_rows(ROWS)
+        with open(writer.manifest_path) as manifest_file:
+            return json.load(manifest_file)
+
+    def check_manifest(self, manifest, decode=bytes.decode):
+        """Check the manifest entries against the chunk files, and return the rows of all chunks."""
+        self.assertEqual(manifest["report"], "report.csv")
+        self.assertEqual(manifest["columns"], HEADER)
+        rows = []
+        for index, chunk in enumerate(manifest["chunks"], start=1):
+            with open(os.path.join(self.tmpdir.name, chunk["key"]), "rb") as chunk_file:
+                data = chunk_file.read()
+            self.assertTrue(chunk["key"].startswith(f"report-{index}.csv"))
+            self.assertEqual(chunk["bytes"], len(data))
+            self.assertEqual(chunk["sha256"], hashlib.sha256(data).hexdigest())
+            reader = csv.reader(io.StringIO(decode(data), newline=""))
+            self.assertEqual(next(reader), HEADER)
+            chunk_rows = list(reader)
+            self.assertEqual(chunk["rows"], len(chunk_rows))
+            rows.extend(chunk_rows)
+        self.assertEqual(manifest["rows"], len(ROWS))
+        self.assertEqual(manifest["bytes"], sum(chunk["bytes"] for chunk in manifest["chunks"]))
+        self.assertEqual(rows, [[str(value) for value in row] for row in ROWS])
+        return rows
+
+    def test_max_rows(self):
+        """Chunks hold at most max_rows rows, and the manifest describes each chunk file."""
+        manifest = self.write(max_rows=128)
+        self.check_manifest(manifest)
+        self.assertEqual([chunk["rows"] for chunk in manifest["chunks"]], [128] * 7 + [104])
+
+    def test_max_bytes(self):
+        """Chunk files are no larger than max_bytes, and the manifest describes each chunk file."""
+        manifest = self.write(max_bytes=4096)
+        self.check_manifest(manifest)
+        self.assertGreater(len(manifest["chunks"]), 1)
+        for chunk in manifest["chunks"]:
+            self.assertLessEqual(chunk["bytes"], 4096)
+
+    def test_compressed_chunks(self):
+        """The manifest lists the size and checksum of compressed chunk files."""
+        manifest = self.write(max_rows=300, compression=GzipCodec())
+        self.check_manifest(manifest, decode=lambda data: gzip.decompress(data).decode("utf-8"))
+        self.assertEqual(len(manifest["chunks"]), 4)
+        self.assertTrue(all(chunk["key"].endswith(".csv.gz") for chunk in manifest["chunks"]))
+
+    def test_chunks_match_single_file(self):
+        """Joining the rows of the chunk files gives the file a CSVWriter writes."""
+        self.write(max_rows=99)
+        single = os.path.join(self.tmpdir.name, "single.csv")
+        with CSVWriter(single, HEADER) as writer:
+            writer.write_rows(ROWS)
+        with open(single, "rb") as single_file:
+            expected = single_file.read()
+
+        with open(f"{os.path.splitext(self.path)[0]}-Manifest.json") as manifest_file:
+            manifest = json.load(manifest_file)
+        joined = b""
+        for index, chunk in enumerate(manifest["chunks"]):
+            with open(os.path.join(self.tmpdir.name, chunk["key"]), "rb") as chunk_file:
+                data = chunk_file.read()
+            joined += data if index == 0 else data.split(b"\r\n", 1)[1]
+        self.assertEqual(joined, expected)
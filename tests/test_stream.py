@@ -0,0 +1,150 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Tests for streaming rows to a consumer."""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from nise.writers import CSVWriter, StreamWriter
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+HEADER = ["index", "name"]
+
+ROWS = [[idx, f"name-{idx % 7}"] for idx in range(1000)]
+
+
+class Consumer(threading.Thread):
+    """A Unix domain socket server reading one stream, recording when its data arrives."""
+
+    def __init__(self, path, limit=None):
+        """Listen on a socket path, for a consumer disconnecting after `limit` bytes, or at the end."""
+        super().__init__(daemon=True)
+        self.limit = limit
+        self.received = []
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(path)
+        self._server.listen(1)
+
+    def run(self):
+        """Read the stream, until its end or the limit."""
+        connection, _ = self._server.accept()
+        with connection:
+            while self.limit is None or sum(len(data) for _, data in self.received) < self.limit:
+                data = connection.recv(65536)
+                if not data:
+                    break
+                self.received.append((time.perf_counter(), data))
+        self._server.close()
+
+    @property
+    def data(self):
+        """Return the bytes received."""
+        return b"".join(data for _, data in self.received)
+
+
+class StreamWriterTest(TestCase):
+    """Tests for StreamWriter."""
+
+    def setUp(self):
+        """Create a directory for the socket."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "stream.sock")
+
+    def tearDown(self):
+        """Remove the directory."""
+        self.tmpdir.cleanup()
+
+    def expected(self):
+        """Return the bytes of ROWS written by a CSVWriter."""
+        path = os.path.join(self.tmpdir.name, "report.csv")
+        with CSVWriter(path, HEADER) as writer:
+            writer.write_rows(ROWS)
+        with open(path, "rb") as report:
+            return report.read()
+
+    def test_stream_matches_csv(self):
+        """The consumer receives the bytes a CSVWriter writes."""
+        consumer = Consumer(self.path)
+        consumer.start()
+        with StreamWriter(self.path, HEADER, buffer_rows=64) as writer:
+            writer.write_rows(ROWS)
+        consumer.join(10)
+        self.assertEqual(consumer.data, self.expected())
+        self.assertEqual(writer.rows, len(ROWS))
+        self.assertEqual(writer.size(), len(consumer.data))
+
+    def test_rate(self):
+        """Rows are paced to the rate, in writes of rate / WRITES_PER_SECOND rows."""
+        consumer = Consumer(self.path)
+        consumer.start()
+        started = time.perf_counter()
+        with StreamWriter(self.path, HEADER, rate=2000) as writer:
+            writer.write_rows(ROWS)
+        consumer.join(10)
+        self.assertEqual(writer.buffer_rows, 100)
+        self.assertEqual(consumer.data, self.expected())
+        # the last buffer is due after the first 900 rows, at 2000 rows per second
+        self.assertGreaterEqual(time.perf_counter() - started, 0.45)
+        received = 0
+        for arrived, data in consumer.received:
+            received += data.count(b"\r\n")
+            # rows never arrive ahead of the rate by more than the header and one buffer
+            self.assertLessEqual(received, 2000 * (arrived - started) + 1 + writer.buffer_rows)
+        self.assertEqual(received, len(ROWS) + 1)
+
+    def test_consumer_disconnect(self):
+        """A write after the consumer disconnects raises BrokenPipeError, and closing the writer does not."""
+        consumer = Consumer(self.path, limit=1)
+        consumer.start()
+        writer = StreamWriter(self.path, HEADER, buffer_rows=10)
+        with self.assertRaises(BrokenPipeError):
+            with writer:
+                consumer.join(10)
+                for _ in range(1000):
+                    writer.write_rows(ROWS)
+        self.assertTrue(writer.disconnected)
+        self.assertLess(writer.rows, 1000 * len(ROWS))
+
+
+class StreamOptionTest(TestCase):
+    """Tests for --stream."""
+
+    def test_early_disconnect(self):
+        """The CLI stops when stdout is closed early, with a warning rather than a traceback."""
+        args = ["-v", "--seed", "3", "--start", "2020-01-01", "--end", "2020-03-01", "--stream", "-"]
+        # a report larger than any pipe buffer
+        args += ["--stream-report", "pod_usage"]
+        process = subprocess.Popen(
+            [sys.executable, "-m", "nise", *args, "ocp", "--clusterid", "test"],
+            cwd=ROOT_DIR,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        lines = [process.stdout.readline() for _ in range(5)]
+        process.stdout.close()
+        _, stderr = process.communicate(timeout=60)
+        self.assertTrue(lines[0].startswith(b"report_period_start,"))
+        self.assertTrue(all(line.endswith(b"\r\n") for line in lines))
+        self.assertEqual(process.returncode, 0)
+        self.assertIn(b"The stream consumer disconnected before the end of the report.", stderr)
+        self.assertNotIn(b"Traceback", stderr)
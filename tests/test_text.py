@@ -0,0 +1,98 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Tests for CSV lines formatted from line templates."""
+import csv
+import io
+from datetime import datetime
+from unittest import TestCase
+
+from nise.config import load_configs
+from nise.generators import get_generator
+from nise.generators.profile import ColumnProfiler
+from nise.generators.text import compile_template, escape, escape_all
+from nise.util import get_from_config
+from nise.util.fake import seed_all
+
+SEED = 3
+
+# columns not modelled by the cluster topology, drawing random values for every row
+EXTRA_COLUMNS = [
+    {"name": "extra", "type": "string", "format": "{}-{}", "seed": ["a", "b,c", 'd"e']},
+    {"name": "other", "type": "string", "format": "{}", "seed": ["x", "y", "z"]},
+    {"name": "constant", "type": "string", "default": "50%"},
+]
+
+
+def ocp_generators():
+    """Return seeded OCP generators for two days, with extra columns that are not modelled by the topology."""
+    seed_all(SEED)
+    generator_class = get_generator("ocp")
+    configs = load_configs("ocp", seed=SEED, report_month=1, report_year=2020, clusterid="test")
+    for config in configs:
+        get_from_config("name", generator_class._period_start, config)["default"] = datetime(2020, 1, 1)
+        get_from_config("name", generator_class._period_end, config)["default"] = datetime(2020, 1, 3)
+        config["columns"].extend(dict(column) for column in EXTRA_COLUMNS)
+    return generator_class.report_set(configs)
+
+
+def csv_lines(rows):
+    """Return rows formatted by csv.writer, one string per line."""
+    output = io.StringIO(newline="")
+    writer = csv.writer(output)
+    lines = []
+    for row in rows:
+        writer.writerow(row)
+        lines.append(output.getvalue())
+        output.seek(0)
+        output.truncate()
+    return lines
+
+
+class TemplateTest(TestCase):
+    """Tests for the line template helpers."""
+
+    def test_escape_matches_csv_writer(self):
+        """Fields are quoted exactly when csv.writer quotes them."""
+        values = ["plain", "a,b", 'say "hi"', "two\nlines", "", None, 1.5, "100%"]
+        self.assertEqual(",".join(map(escape, values)) + "\r\n", csv_lines([values])[0])
+        self.assertEqual(escape_all(values), [escape(value) for value in values])
+
+    def test_compile_template(self):
+        """Constant fields are written into the template, with % escaped."""
+        template, callables = compile_template(["50%", lambda: "a", "b"])
+        self.assertEqual(template, "50%%,%s,b\r\n")
+        self.assertEqual(template % tuple(field() for field in callables), "50%,a,b\r\n")
+
+
+class TextLinesTest(TestCase):
+    """Tests for text_lines()."""
+
+    def test_text_lines_match_lines(self):
+        """text_lines() emits the rows of lines(), formatted as csv.writer formats them."""
+        expected = [csv_lines(generator.lines()) for generator in ocp_generators()]
+        for generator, lines in zip(ocp_generators(), expected):
+            self.assertTrue(lines)
+            self.assertEqual(list(generator.text_lines()), lines)
+
+    def test_profiled_text_lines_match_lines(self):
+        """Instrumented columns, which are called row by row, emit the same lines."""
+        expected = [list(generator.text_lines()) for generator in ocp_generators()]
+        generators = ocp_generators()
+        for generator in generators:
+            generator.profiler = ColumnProfiler()
+        for generator, lines in zip(generators, expected):
+            self.assertEqual(list(generator.text_lines()), lines)
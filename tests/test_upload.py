@@ -0,0 +1,167 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Tests for the chunked upload pipeline, against a local stand-in ingress server."""
+import os
+import re
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+from nise.exceptions import NiseError
+from nise.upload import UploadPipeline
+from nise.writers import CSVWriter
+
+
+class IngressHandler(BaseHTTPRequestHandler):
+    """Stand-in ingress endpoint storing the chunks of each file by offset."""
+
+    def do_POST(self):  # noqa: N802
+        """Store a chunk, or fail it with the server's next queued status."""
+        data = self.rfile.read(int(self.headers["Content-Length"] or 0))
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            status = server.statuses.pop(0) if server.statuses else 200
+            if status == 200:
+                match = re.match(r"bytes (\d+)-\d+/|bytes \*/", self.headers["Content-Range"])
+                offset = int(match.group(1)) if match.group(1) else None
+                chunks = server.files.setdefault(self.headers["X-Nise-Filename"], {})
+                if offset is not None:
+                    chunks[offset] = data
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        """Keep test output quiet."""
+
+
+class UploadPipelineTest(TestCase):
+    """Tests for UploadPipeline."""
+
+    def setUp(self):
+        """Start a stand-in ingress server on a free local port."""
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), IngressHandler)
+        self.server.lock = threading.Lock()
+        self.server.files = {}
+        self.server.statuses = []
+        self.server.requests = 0
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.endpoint = f"http://127.0.0.1:{self.server.server_address[1]}/upload"
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Stop the server."""
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmpdir.cleanup()
+
+    def received(self, fname):
+        """Return the bytes of a file, reassembled from its chunks."""
+        chunks = self.server.files.get(fname, {})
+        return b"".join(chunks[offset] for offset in sorted(chunks))
+
+    def write_file(self, fname, size):
+        """Write a file of random bytes, and return its path and contents."""
+        path = os.path.join(self.tmpdir.name, fname)
+        data = os.urandom(size)
+        with open(path, "wb") as report:
+            report.write(data)
+        return path, data
+
+    def test_chunks_reassemble_to_file(self):
+        """Chunks of several files are reassembled into the original bytes."""
+        sent = {}
+        with UploadPipeline(self.endpoint, concurrency=3, chunk_size=1000) as upload:
+            for fname, size in (("a.csv", 4500), ("b.csv", 3000), ("empty.csv", 0)):
+                path, sent[fname] = self.write_file(fname, size)
+                upload.send_file(path)
+        for fname, data in sent.items():
+            self.assertEqual(self.received(fname), data, fname)
+        self.assertEqual(upload.files, 3)
+        self.assertEqual(upload.bytes, 7500)
+        self.assertEqual((upload.retries, upload.failures), (0, 0))
+
+    def test_streamed_writer_output(self):
+        """Rows written by a CSVWriter with an upload pipeline are uploaded as the file is written."""
+        path = os.path.join(self.tmpdir.name, "rows.csv")
+        with UploadPipeline(self.endpoint, chunk_size=256) as upload:
+            with CSVWriter(path, ["a", "b"], buffer_rows=7, upload=upload) as writer:
+                writer.write_rows([idx, f"value {idx}"] for idx in range(100))
+        with open(path, "rb") as report:
+            self.assertEqual(self.received("rows.csv"), report.read())
+
+    def test_appended_writer_output(self):
+        """Appending to a file with an upload pipeline uploads the whole file, not only the appended rows."""
+        path = os.path.join(self.tmpdir.name, "rows.csv")
+        with CSVWriter(path, ["a", "b"]) as writer:
+            writer.write_rows([idx, "first"] for idx in range(50))
+        with UploadPipeline(self.endpoint, chunk_size=256) as upload:
+            with CSVWriter(path, ["a", "b"], buffer_rows=7, upload=upload, append=True) as writer:
+                writer.write_rows([idx, "appended"] for idx in range(50))
+        with open(path, "rb") as report:
+            data = report.read()
+        self.assertTrue(data.startswith(b"a,b\r\n0,first\r\n"))
+        self.assertEqual(self.received("rows.csv"), data)
+        self.assertEqual(upload.bytes, len(data))
+
+    def test_retries_on_service_unavailable(self):
+        """Chunks answered with 503 are retried until they are accepted."""
+        self.server.statuses = [503, 503]
+        path, data = self.write_file("retry.csv", 2500)
+        with UploadPipeline(self.endpoint, concurrency=1, chunk_size=1000, backoff=0.01) as upload:
+            upload.send_file(path)
+        self.assertEqual(self.received("retry.csv"), data)
+        self.assertEqual(upload.retries, 2)
+        self.assertEqual(upload.failures, 0)
+        self.assertEqual(self.server.requests, 5)
+
+    def test_unexpected_errors_are_counted(self):
+        """An unexpected error fails its chunk without stopping the upload threads."""
+        path, data = self.write_file("error.csv", 5000)
+        upload = UploadPipeline(self.endpoint, concurrency=1, chunk_size=500)
+        send = upload._send
+        calls = []
+
+        def failing_send(*args):
+            calls.append(args[1])
+            if len(calls) == 1:
+                raise ValueError("unexpected")
+            send(*args)
+
+        upload._send = failing_send
+        with self.assertRaises(NiseError):
+            with upload:
+                upload.send_file(path)
+        self.assertEqual(len(calls), 11)
+        self.assertEqual(upload.failures, 1)
+        self.assertEqual(upload.chunks, 10)
+        self.assertEqual(self.received("error.csv"), data[500:])
+
+    def test_failures_are_counted(self):
+        """Chunks failing every attempt are counted, and fail the pipeline on exit."""
+        self.server.statuses = [503] * 3 + [400]
+        path, _ = self.write_file("fail.csv", 1500)
+        upload = UploadPipeline(self.endpoint, concurrency=1, chunk_size=1000, attempts=3, backoff=0.01)
+        with self.assertRaises(NiseError):
+            with upload:
+                upload.send_file(path)
+        self.assertEqual(upload.failures, 2)
+        self.assertEqual(upload.retries, 2)
+        self.assertEqual(upload.chunks, 0)